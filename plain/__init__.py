@@ -10,7 +10,8 @@ import requests
 from .compat import parse, urlencode
 from .parsers.html import (
     Table,
-    Article as BaseArticle
+    Article as BaseArticle,
+    Readability,
 )
 
 
@@ -85,5 +86,5 @@ class Url(str):
 
     def hash(self):
         """return an md5 hash of the url"""
-        return hashlib.md5(self).hexdigest()
+        return hashlib.md5(self.encode("utf-8")).hexdigest()
 
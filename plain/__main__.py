@@ -1,24 +1,88 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
+import sys
+import csv
+import json
 
 import captain
 from captain.decorators import arg
 
 from plain import Table
+from plain.compat import String
 
 
 @arg("url", help="the url of the html table you want")
-#@arg("--csv", action="store_true", help="")
-#@arg("--json", action="store_true", help="print table data to the screen as json")
-# TODO -- add --format that can take "json" or "csv" and defaults to "json"
-def main_table(url):
+@arg(
+    "--format", "-f",
+    dest="format",
+    choices=["json", "jsonl", "csv"],
+    default="json",
+    help="how the table data will be printed to the screen, jsonl, csv, and json with --table print each row as soon as it is parsed"
+)
+@arg(
+    "--table", "-t",
+    dest="table",
+    type=int,
+    default=None,
+    help="only print the table at this index (0 based), json without this prints everything and with it prints the caption and rows of the table, jsonl and csv default to the first table"
+)
+def main_table(url, format="json", table=None):
 
     t = Table(url)
-    t.parse()
-    print(t.json())
+    out = sys.stdout
 
+    if format == "json" and table is None:
+        # every table is needed, the json is still written as it is encoded so the
+        # whole string is never built
+        t.parse()
+        t.dump(out)
+        out.write("\n")
+        return
 
+    # everything else is streamed row by row so output starts right away and the
+    # whole table is never held in memory
+    rows = t.stream(table or 0)
 
+    try:
+        if format == "csv":
+            # the columns can change part way through the table (eg, a header row in
+            # the middle or a wider row), when they do the new header is written
+            # before the row so every row lines up with the header above it
+            writer = csv.writer(out)
+            keys = None
+            for row in rows:
+                row_keys = list(row.keys())
+                if row_keys != keys:
+                    keys = row_keys
+                    writer.writerow(keys)
+                writer.writerow(["" if v is None else String(v) for v in row.columns()])
+
+        elif format == "jsonl":
+            for row in rows:
+                out.write(json.dumps(row, default=t.jsonable))
+                out.write("\n")
+
+        else:
+            # {"caption": ..., "rows": [...]}, the caption is known once the first
+            # row is found (or the table ends)
+            def start():
+                out.write("{{\"caption\": {}, \"rows\": [".format(json.dumps(String(t.stream_caption))))
+
+            count = 0
+            for row in rows:
+                if not count:
+                    start()
+                out.write(",\n" if count else "\n")
+                out.write(json.dumps(row, default=t.jsonable))
+                count += 1
+
+            if not count:
+                start()
+            out.write("\n]}\n")
+
+    except IndexError as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, division, print_function, absolute_import
+import os
+import io
+import json
+import time
+import threading
+import tempfile
+import hashlib
+import sqlite3
+import pickle
+from collections import OrderedDict
+
+from . import Url
+from .parsers.base import Response
+
+
+# py2 doesn't have os.replace, rename is only atomic on posix there
+replace = getattr(os, "replace", os.rename)
+
+
+class ResponseCache(object):
+    """An on disk cache of fetched responses
+
+    Each response is saved as two files in directory, <hash>.body that holds the
+    raw content and <hash>.json that holds the status, headers, and the ETag and
+    Last-Modified values, the hash is Url(url).hash() (or an md5 of the url when
+    Url can't simplify it)
+
+    A cached response that is younger than ttl is used without touching the network,
+    an older one is revalidated with a conditional request (If-None-Match and
+    If-Modified-Since) and if the server responds with a 304 the cached body is used
+
+    :Example:
+        cache = ResponseCache("/tmp/plain", max_size=500 * 1024 * 1024, ttl=3600)
+        t = Table(url, cache=cache)
+        t.parse()
+    """
+    def __init__(self, directory, max_size=None, ttl=None):
+        """
+        :param directory: str, where the responses will be saved
+        :param max_size: int, the most bytes of body the cache will hold, when this is
+            exceeded the least recently used responses are removed
+        :param ttl: int, how many seconds a cached response is used before it has to
+            be revalidated, None means always revalidate
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._index = None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def index(self):
+        """key -> body size, ordered from least to most recently used, this is built
+        from the modification times of the files in directory the first time it is
+        needed"""
+        if self._index is None:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".body"):
+                    path = os.path.join(self.directory, name)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, name[:-5], st.st_size))
+
+            self._index = OrderedDict(
+                (key, size) for mtime, key, size in sorted(entries)
+            )
+
+        return self._index
+
+    @property
+    def size(self):
+        """How many bytes of body are currently cached"""
+        return sum(self.index.values())
+
+    def get_key(self, url):
+        try:
+            return Url(url).hash()
+
+        except ValueError:
+            # Url is strict about query strings (eg, "?print" or "?x=1&&y=2") but
+            # those are still valid urls that can be fetched and cached
+            return hashlib.md5(url.encode("utf-8")).hexdigest()
+
+    def get_paths(self, key):
+        """returns the (body, meta) paths of key"""
+        base = os.path.join(self.directory, key)
+        return "{}.body".format(base), "{}.json".format(base)
+
+    def get(self, key):
+        """return the cached meta dict and body of key
+
+        :returns: tuple, (meta, body) or (None, None) if key isn't cached
+        """
+        body_path, meta_path = self.get_paths(key)
+        try:
+            with io.open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+
+            with io.open(body_path, mode="rb") as f:
+                body = f.read()
+
+        except (IOError, OSError, ValueError):
+            return None, None
+
+        return meta, body
+
+    def set(self, key, response):
+        """cache response
+
+        :param key: str
+        :param response: requests.Response
+        """
+        headers = response.headers
+        meta = {
+            "url": response.url,
+            "status_code": response.status_code,
+            "encoding": response.encoding,
+            "headers": dict(headers),
+            "etag": headers.get("ETag", None),
+            "last_modified": headers.get("Last-Modified", None),
+            "stored": time.time(),
+        }
+        body = response.content
+
+        body_path, meta_path = self.get_paths(key)
+        with self.lock:
+            self.write_file(body_path, body)
+            self.write_meta(meta_path, meta)
+
+            self.index.pop(key, None)
+            self.index[key] = len(body)
+            self.evict()
+
+    def write_meta(self, path, meta):
+        self.write_file(path, json.dumps(meta).encode("utf-8"))
+
+    def write_file(self, path, data):
+        """write data to a temp file and then move it to path, get() doesn't hold
+        the lock so it should only ever see a whole file
+
+        :param path: str
+        :param data: bytes
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with io.open(fd, mode="wb") as f:
+                f.write(data)
+            replace(tmp_path, path)
+
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def touch(self, key, meta=None):
+        """mark key as the most recently used, if meta is passed in it is saved"""
+        body_path, meta_path = self.get_paths(key)
+        with self.lock:
+            if meta:
+                self.write_meta(meta_path, meta)
+            os.utime(body_path, None)
+            if key in self.index:
+                self.index[key] = self.index.pop(key)
+
+    def delete(self, key):
+        with self.lock:
+            self._delete(key)
+
+    def _delete(self, key):
+        for path in self.get_paths(key):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self.index.pop(key, None)
+
+    def evict(self):
+        """remove the least recently used responses until the cache fits in max_size,
+        the lock should be held when this is called"""
+        if self.max_size is None: return
+
+        size = sum(self.index.values())
+        while size > self.max_size and self.index:
+            key, key_size = next(iter(self.index.items()))
+            self._delete(key)
+            size -= key_size
+
+    def is_fresh(self, meta):
+        """True if meta can be used without revalidating it"""
+        if self.ttl is None: return False
+        return (time.time() - meta["stored"]) < self.ttl
+
+    def create_response(self, meta, body):
+        res = Response(
+            meta["url"],
+            meta["status_code"],
+            body,
+            headers=meta["headers"],
+            encoding=meta["encoding"],
+        )
+        res.from_cache = True
+        return res
+
+    def fetch(self, instance, **kwargs):
+        """fetch the url of instance, using the cached response if it hasn't changed
+
+        :param instance: Base instance, its _fetch() method will be used to make the
+            (possibly conditional) request
+        :param **kwargs: passed through to _fetch()
+        :returns: requests.Response or Response, a Response from the cache will have
+            a from_cache property set to True
+        """
+        key = self.get_key(instance.url)
+        meta, body = self.get(key)
+        if meta:
+            if self.is_fresh(meta):
+                self.touch(key)
+                return self.create_response(meta, body)
+
+            headers = dict(kwargs.pop("headers", None) or {})
+            if meta["etag"]:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                headers["If-Modified-Since"] = meta["last_modified"]
+            kwargs["headers"] = headers
+
+        res = instance._fetch(**kwargs)
+
+        if meta and res.status_code == 304:
+            # the validators can change even though the body didn't
+            headers = res.headers
+            meta["etag"] = headers.get("ETag", None) or meta["etag"]
+            meta["last_modified"] = headers.get("Last-Modified", None) or meta["last_modified"]
+            meta["stored"] = time.time()
+            self.touch(key, meta)
+            return self.create_response(meta, body)
+
+        if res.status_code < 400:
+            self.set(key, res)
+
+        return res
+
+
+class MemoryCache(object):
+    """An in memory least recently used cache, this can be used as the result cache
+    of a parser
+
+    the cached values are shared, so the fields of parsers that got them from this
+    cache should be treated as read only
+
+    :Example:
+        cache = MemoryCache(size=1000)
+        t = Table(url, body, result_cache=cache)
+        t.parse()
+    """
+    def __init__(self, size=1024):
+        """
+        :param size: int, the most values the cache will hold
+        """
+        self.size = size
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """return the value of key or None if it isn't cached"""
+        with self.lock:
+            value = self.values.pop(key, None)
+            if value is not None:
+                self.values[key] = value
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.values.pop(key, None)
+            self.values[key] = value
+            while len(self.values) > self.size:
+                self.values.popitem(last=False)
+
+
+class SqliteCache(object):
+    """An on disk cache of pickled values saved in a sqlite database, this can be used
+    as the result cache of a parser and can be shared between processes
+
+    :Example:
+        cache = SqliteCache("/tmp/plain.sqlite")
+        t = Table(url, body, result_cache=cache)
+        t.parse()
+    """
+    def __init__(self, path):
+        """
+        :param path: str, the sqlite database file, it is created if it doesn't exist
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB)"
+            )
+
+    def get(self, key):
+        """return the value of key or None if it isn't cached"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM results WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+        return pickle.loads(bytes(row[0])) if row else None
+
+    def set(self, key, value):
+        value = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+                    (key, value)
+                )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""asyncio backend for the parsers, this needs aiohttp installed:
+
+    $ pip install aiohttp
+
+This is in its own module so the rest of plain doesn't need aiohttp (or python 3)
+to be imported
+"""
+from __future__ import unicode_literals, division, print_function, absolute_import
+import asyncio
+
+import aiohttp
+
+from .base import Response
+
+
+async def afetch(instance, session):
+    """fetch the body of instance using a non-blocking client, this is the asyncio
+    version of Base.fetch
+
+    :param instance: Base instance
+    :param session: aiohttp.ClientSession
+    :returns: Response
+    """
+    url, kwargs = instance.get_request()
+    async with session.get(url, **kwargs) as res:
+        content = await res.read()
+        response = Response(
+            str(res.url),
+            res.status,
+            content,
+            headers=dict(res.headers),
+            encoding=res.charset,
+        )
+
+    instance.check_response(response)
+    return response
+
+
+async def aparse(instance, session=None, executor=None):
+    """asyncio version of Base.parse, see Base.aparse
+
+    :param instance: Base instance
+    :param session: aiohttp.ClientSession, if None one is created for this call
+    :param executor: concurrent.futures.Executor, simplify() is ran in this
+    :returns: the fields of instance
+    """
+    if instance.body is None:
+        with instance.timer("fetch"):
+            if session is None:
+                async with aiohttp.ClientSession() as session:
+                    res = await afetch(instance, session)
+
+            else:
+                res = await afetch(instance, session)
+
+            instance.incr("bytes", len(res.content))
+
+        instance.body = instance._parse(res)
+
+    loop = asyncio.get_event_loop()
+    with instance.timer("simplify"):
+        await loop.run_in_executor(executor, instance.simplify)
+    return instance.fields
+
+
+async def aparse_many(parser_class, urls, limit=10, session=None, executor=None, **kwargs):
+    """asyncio version of Base.parse_many, fetch and parse a batch of urls with at
+    most limit of them being worked on at the same time
+
+    an exception while fetching or parsing one url won't stop the batch, it is set
+    into the .error property of that url's instance instead of being raised
+
+    :Example:
+        ts = await aparse_many(Table, urls, limit=20)
+
+    :param parser_class: Base child class, the parser each url will use
+    :param urls: iterable, the urls to fetch and parse
+    :param limit: int, the most urls that can be fetched and parsed at the same time
+    :param session: aiohttp.ClientSession, if None a session whose connection pool
+        holds limit connections is created for the batch
+    :param executor: concurrent.futures.Executor, simplify() is ran in this
+    :param **kwargs: passed through to the constructor of each instance
+    :returns: list of parser_class instances in the same order as urls
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def parse(url, session):
+        instance = parser_class(url, **kwargs)
+        async with semaphore:
+            try:
+                await aparse(instance, session=session, executor=executor)
+
+            except Exception as e:
+                instance.error = e
+
+        return instance
+
+    if session is None:
+        connector = aiohttp.TCPConnector(limit=limit)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await asyncio.gather(*[parse(url, session) for url in urls])
+
+    else:
+        return await asyncio.gather(*[parse(url, session) for url in urls])
@@ -1,21 +1,303 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
+import io
 import json
+import hashlib
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from bs4 import SoupStrainer
 
 from ..soup import Soup
+from ..stats import NULL_TIMER
+
+
+def simplify_body(args):
+    """Used by Base.simplify_many to run the simplify stage in another process, this
+    has to be a module level function so it can be pickled
+
+    :param args: tuple, (parser_class, url, body, kwargs)
+    :returns: tuple, (fields, error), one of them will be None
+    """
+    parser_class, url, body, kwargs = args
+    try:
+        instance = parser_class(url, body, **kwargs)
+        instance.simplify()
+        return instance.fields, None
+
+    except Exception as e:
+        return None, e
+
+
+class Response(object):
+    """A minimal stand-in for requests.Response, used when the body was retrieved by
+    something other than requests (eg, the asyncio backend) so _parse() can treat it
+    like any other response"""
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", "replace")
+
+    def __init__(self, url, status_code, content, headers=None, encoding=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = encoding
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
 
 
 class Base(object):
     """It's the idea that all the various parsers will inherit from this class"""
+
+    # the Soup backend (eg, "lxml") this parser uses, None uses Soup's default
+    features = None
+
+    # a bs4 SoupStrainer (or anything SoupStrainer accepts as a name, like a list
+    # of tag names), when set only the matching elements and their children are
+    # put into the parsed tree, see get_parse_only()
+    parse_only = None
+
+    @property
+    def body(self):
+        return self._body
+
+    @body.setter
+    def body(self, body):
+        self._body = body
+        # any previously parsed tree belongs to the old body
+        self.release_soup()
+
     @property
     def soup(self):
-        return Soup(self.body)
+        """The parsed document of body, the body is only parsed on first access and
+        then the tree is cached until body changes or release_soup() is called"""
+        if self._soup is None:
+            with self.timer("soup"):
+                self._soup = self.create_soup()
+
+            if self.stats is not None:
+                self.stats.incr("elements", len(self._soup.find_all(True)))
+
+        return self._soup
 
-    def __init__(self, url, body=None):
+    def __init__(self, url, body=None, session=None, cache=None, result_cache=None, stats=None):
+        """
+        :param url: str, the url of the body
+        :param body: str, the body, if this is None then url will be fetched
+        :param session: requests.Session, if passed in this will be used to fetch the
+            url so connections can be shared with other instances
+        :param cache: plain.cache.ResponseCache, if passed in fetched responses are
+            cached and revalidated with conditional requests
+        :param result_cache: plain.cache.MemoryCache or SqliteCache, if passed in the
+            simplified fields are cached by the hash of body so an identical body is
+            never simplified twice
+        :param stats: plain.stats.Stats, if passed in the time each stage of parsing
+            takes and counts of what was parsed are added to it
+        """
         self.url = url
         self.body = body
+        self.session = session
+        self.cache = cache
+        self.result_cache = result_cache
+        self.stats = stats
+        self.error = None
+
+    @classmethod
+    def create_session(cls, size=10):
+        """create a requests session that can keep size connections open so it can be
+        shared between threads
+
+        :param size: int, how many connections should be pooled
+        :returns: requests.Session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @classmethod
+    def parse_many(cls, urls, workers=10, session=None, ordered=True, **kwargs):
+        """Fetch and parse a batch of urls using a pool of threads that share one
+        connection pooled session
+
+        an exception while fetching or parsing one url won't stop the batch, it is
+        set into the .error property of that url's instance instead of being raised
+
+        :Example:
+            for t in Table.parse_many(urls, workers=20):
+                if t.error:
+                    print(t.url, t.error)
+                else:
+                    print(t.url, t.tables)
+
+        :param urls: iterable, the urls to fetch and parse
+        :param workers: int, how many urls can be fetched at the same time
+        :param session: requests.Session, if None a session is created for the batch
+        :param ordered: bool, True to yield in the same order as urls, False to yield
+            the instances as they finish
+        :param **kwargs: passed through to the constructor of each instance
+        :returns: generator of instances of this class
+        """
+        def parse(url):
+            instance = cls(url, session=session, **kwargs)
+            try:
+                instance.parse()
+
+            except Exception as e:
+                instance.error = e
+
+            # only the fields are yielded back, the tree would just be held in
+            # memory until the caller is done with the instance
+            instance.release_soup()
+            return instance
+
+        close_session = session is None
+        if close_session:
+            session = cls.create_session(workers)
+
+        # only a window of urls is submitted at a time so a huge batch doesn't hold
+        # every finished instance in memory until the whole batch is done
+        urls = iter(urls)
+        window = max(workers * 2, 1)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+
+        def submit(count):
+            for url in islice(urls, count):
+                pending.append(executor.submit(parse, url))
+
+        try:
+            submit(window)
+            if ordered:
+                while pending:
+                    instance = pending.popleft().result()
+                    submit(1)
+                    yield instance
+
+            else:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                    submit(len(done))
+
+                    for future in done:
+                        yield future.result()
+
+        finally:
+            # if the caller stopped early the urls that haven't started yet are
+            # cancelled instead of being fetched
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+            if close_session:
+                session.close()
+
+    def create_soup(self):
+        """Parse body into a Soup tree, child classes can override this to change
+        what gets parsed
+
+        :returns: Soup
+        """
+        return Soup(self.body, self.features, parse_only=self.get_parse_only())
+
+    def get_parse_only(self):
+        """Return what elements should be parsed into the tree, None to parse
+        everything. Parsing only what is needed is faster and uses less memory
+
+        https://www.crummy.com/software/BeautifulSoup/bs4/doc/#parsing-only-part-of-a-document
+
+        :returns: SoupStrainer or None
+        """
+        parse_only = self.parse_only
+        if parse_only is not None and not isinstance(parse_only, SoupStrainer):
+            parse_only = SoupStrainer(parse_only)
+        return parse_only
+
+    def release_soup(self):
+        """Drop the cached parsed document so its memory can be reclaimed, the
+        next access of .soup will parse body again"""
+        self._soup = None
+
+    @classmethod
+    def simplify_many(cls, bodies, processes=None, chunksize=1, **kwargs):
+        """Simplify a batch of already fetched bodies using a pool of processes so
+        the cpu bound parsing can use every core
+
+        only the url and body are sent to each process and only the simplified fields
+        are sent back, an exception while simplifying one body is set into the
+        .error property of that body's instance instead of being raised
+
+        :Example:
+            bodies = [(url, body), ...]
+            for t in Table.simplify_many(bodies, processes=8, chunksize=10):
+                print(t.url, t.tables)
+
+        :param bodies: iterable of tuples, (url, body) that would be passed to the
+            constructor of this class
+        :param processes: int, how many processes, defaults to the cpu count
+        :param chunksize: int, how many bodies are sent to a process at a time, bigger
+            chunks mean less overhead when there are lots of small bodies
+        :param **kwargs: passed through to the constructor of each instance
+        :returns: generator of instances of this class in the same order as bodies
+        """
+        bodies = list(bodies)
+        args = ((cls, url, body, kwargs) for url, body in bodies)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(simplify_body, args, chunksize=chunksize)
+            for (url, body), (fields, error) in zip(bodies, results):
+                instance = cls(url, body, **kwargs)
+                instance.fields = fields
+                instance.error = error
+                yield instance
+
+    def aparse(self, session=None, executor=None):
+        """asyncio version of parse(), the url is fetched with a non-blocking client
+        and simplify() is ran in an executor so the event loop is never blocked
+
+        :Example:
+            fields = await Table(url).aparse()
+
+        This needs aiohttp installed, see plain.parsers.aio for more information
+
+        :param session: aiohttp.ClientSession, if None one is created for this call
+        :param executor: concurrent.futures.Executor, None uses the loop's default
+        :returns: coroutine that returns the same thing as parse()
+        """
+        from .aio import aparse
+        return aparse(self, session=session, executor=executor)
+
+    @classmethod
+    def aparse_many(cls, urls, limit=10, session=None, executor=None, **kwargs):
+        """asyncio version of parse_many(), see plain.parsers.aio.aparse_many
+
+        :Example:
+            ts = await Table.aparse_many(urls, limit=20)
+
+        :returns: coroutine that returns a list of instances in the same order as urls
+        """
+        from .aio import aparse_many
+        return aparse_many(cls, urls, limit=limit, session=session, executor=executor, **kwargs)
 
     def parse(self):
         """This is the public facing method where all the magic happens, instantiate
@@ -24,10 +306,13 @@ class Base(object):
         :returns: a dict of values pulled from the url including "content" key
         """
         if self.body is None:
-            res = self.fetch()
+            with self.timer("fetch"):
+                res = self.fetch()
+                self.incr("bytes", len(res.content))
             self.body = self._parse(res)
 
-        self.simplify()
+        with self.timer("simplify"):
+            self.simplify()
 
         return self.fields
 
@@ -35,24 +320,124 @@ class Base(object):
         """Given a response object return what you want this class's body to contain"""
         return response.content
 
-    def fetch(self):
+    def fetch(self, **kwargs):
         """If you don't pass body into the init method then you will need to go and
         get it, that's what this method does
 
+        :param **kwargs: passed through to the request (eg, stream=True)
         :returns: requests.Response
         """
-        res = self._fetch()
-        if res.status_code >= 400:
-            raise IOError("Problem fetching {}, code {}".format(self.url, res.status_code))
+        if self.cache is None:
+            res = self._fetch(**kwargs)
 
+        else:
+            res = self.cache.fetch(self, **kwargs)
+            if getattr(res, "from_cache", False):
+                self.incr("response_cache_hits")
+
+        self.check_response(res)
         return res
 
-    def _fetch(self):
-        return requests.get(self.url)
+    def timer(self, name):
+        """Return a context manager that times its block as stage name in stats, when
+        there are no stats this does nothing
+
+        :Example:
+            with self.timer("find_tables"):
+                tables = self.find_tables(soup)
+
+        :param name: str, the name of the stage
+        """
+        stats = self.stats
+        return NULL_TIMER if stats is None else stats.timer(name)
+
+    def incr(self, name, amount=1):
+        """Add amount to the name count in stats, when there are no stats this does
+        nothing"""
+        if self.stats is not None:
+            self.stats.incr(name, amount)
+
+    def check_response(self, response):
+        """raise an error if the fetched response wasn't successful
+
+        :param response: requests.Response or Response
+        """
+        if response.status_code >= 400:
+            raise IOError("Problem fetching {}, code {}".format(self.url, response.status_code))
+
+    def get_request(self):
+        """Return what should be requested to fetch body, this is used by both the
+        requests and asyncio backends
+
+        :returns: tuple, (url, kwargs) where kwargs can have params and headers keys
+        """
+        return self.url, {}
+
+    def _fetch(self, **kwargs):
+        session = self.session or requests
+        url, request_kwargs = self.get_request()
+        headers = kwargs.pop("headers", None)
+        if headers:
+            request_kwargs.setdefault("headers", {}).update(headers)
+        request_kwargs.update(kwargs)
+        return session.get(url, **request_kwargs)
 
     def simplify(self):
-        """simplify what was returned from requests"""
-        self.fields = self._simplify()
+        """simplify what was returned from requests
+
+        the parsed tree is released when this is done, simplifying can change the
+        tree in place and the fields are all that is needed afterwards, so .soup
+        will be the parsed body again (and not a tree that is kept in memory for
+        the life of the instance)
+        """
+        try:
+            if self.result_cache is None:
+                self.fields = self._simplify()
+
+            else:
+                key = self.get_cache_key()
+                fields = self.result_cache.get(key)
+                if fields is None:
+                    fields = self._simplify()
+                    self.result_cache.set(key, fields)
+
+                else:
+                    self.incr("result_cache_hits")
+
+                self.fields = fields
+
+        finally:
+            self.release_soup()
+
+    def get_options(self):
+        """Return the options that change what _simplify() returns for the same body,
+        these are part of the result cache key
+
+        :returns: dict
+        """
+        return {}
+
+    def get_cache_key(self):
+        """Return the key of the simplified fields of body in the result cache, this is
+        a hash of the body, this class, the Soup backend, and the values of
+        get_options()
+
+        :returns: str
+        """
+        body = self.body
+        if isinstance(body, dict):
+            body = json.dumps(body, sort_keys=True)
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+
+        klass = type(self)
+        h = hashlib.md5()
+        h.update("{}.{}".format(klass.__module__, klass.__name__).encode("utf-8"))
+        # each backend builds a (slightly) different tree from the same body
+        h.update((self.features or Soup.get_features()).encode("utf-8"))
+        h.update(repr(sorted(self.get_options().items())).encode("utf-8"))
+        h.update(body)
+        return h.hexdigest()
 
     def _simplify(self):
         """handle converting the requests response to a nice dictionary
@@ -61,8 +446,53 @@ class Base(object):
         """
         raise NotImplementedError()
 
-    def json(self):
-        """returns this instance as a nicely formatted json string"""
+    def json(self, compact=False):
+        """returns this instance as a nicely formatted json string
+
+        :param compact: bool, True to skip the indenting and key sorting, this is a lot
+            faster and will use orjson if it is installed
+        :returns: str
+        """
+        if compact:
+            if orjson:
+                return orjson.dumps(self.fields, default=self.jsonable).decode("utf-8")
+            return json.dumps(self.fields, separators=(",", ":"), default=self.jsonable)
+
         # https://coderwall.com/p/gmxnqg/pretty-printing-a-python-dictionary
-        return json.dumps(self.fields, sort_keys=True, indent=4)
+        return json.dumps(self.fields, sort_keys=True, indent=4, default=self.jsonable)
+
+    def dump(self, fp, compact=False):
+        """write this instance as json to fp, the json is written in chunks as it is
+        encoded so the whole string is never built (unless orjson is used, it is fast
+        enough that it's worth it)
+
+        :Example:
+            with open(path, "w") as fp:
+                t.dump(fp, compact=True)
+
+        :param fp: file object, opened in text or binary mode
+        :param compact: bool, see json()
+        """
+        binary = isinstance(fp, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(fp, "mode", "")
+        if compact and orjson:
+            data = orjson.dumps(self.fields, default=self.jsonable)
+            fp.write(data if binary else data.decode("utf-8"))
+            return
+
+        if compact:
+            encoder = json.JSONEncoder(separators=(",", ":"), default=self.jsonable)
+        else:
+            encoder = json.JSONEncoder(sort_keys=True, indent=4, default=self.jsonable)
+
+        for chunk in encoder.iterencode(self.fields):
+            fp.write(chunk.encode("utf-8") if binary else chunk)
+
+    def jsonable(self, o):
+        """json calls this for every value in fields it doesn't know how to serialize,
+        child classes can override this to convert their own values
+
+        :param o: mixed, the value that couldn't be serialized
+        :returns: mixed, a value json can serialize
+        """
+        raise TypeError("{} is not JSON serializable".format(type(o).__name__))
 
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
 
-from .article import Mercury as Article
+from .article import Mercury as Article, Readability
 from .table import Table
 from .tag import Attributes
-from .html import HTML
+from .html import HTML, LazyHTML
 
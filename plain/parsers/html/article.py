@@ -1,20 +1,23 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
+import os
+import re
+import json
 
 from bs4.element import NavigableString
-import requests
 
 from ..base import Base, Soup
+from ...compat import parse, String
 from .tag import Attributes
 
 
 """
 order of operations of parsers:
 
-    1 - plugin of the hostname, so arstechnica.com would first search for ArstechnicaCom
-    2 - Article plugin that will search for an article tag
-    3 - generic that will parse based on found plain text outside of tags
-    4 - if all else fails, fallback to third party parser?
+    1 - plugin of the hostname, see plain.parsers.registry
+    2 - Readability, which looks for an article tag and then falls back to the
+        element with the most paragraph text
+    3 - if all else fails, fallback to third party parser (Mercury)
 
 Also, on the url, should I strip the #anchor and utm_* params? I say yes, I would need to
 compensate for #! hashbanging though if that is still a thing (I might be showing my age)
@@ -25,41 +28,72 @@ Whichever one is chosen, the html should be stripped of class, id, and style att
 
 class Article(Base):
 
-# code to choose a parser based on url
-#         ps = []
-#         if self.original_url:
-#             o = parse.urlparse(self.original_url)
-#             host = o.hostname
-#             bits = host.split(".")
-#             class_name = "".join((b.lower().title() for b in bits))
-#             klass = getattr(parsers, class_name, None)
-#             if klass:
-#                 ps.append(klass)
-# 
-#         ps.append(parsers.Article)
-#         ps.append(parsers.MicroData)
-#         ps.append(parsers.Generic)
-#         return ps
-
-    @property
-    def soup(self):
-        return Soup(self.body["content"])
+    # remove tags get completely removed from the tree, strings and all
+    remove_tags = set([
+        "script",
+        "iframe",
+        "form",
+        "input",
+        "textarea",
+        "button",
+        "aside",
+    ])
+
+    # unwrapped tags are removed but strings between <tag> and </tag> are kept
+    unwrap_tags = set([
+        "span",
+        "meta"
+    ])
+
+    def create_soup(self):
+        return Soup(self.body["content"], self.features, parse_only=self.get_parse_only())
+
+    def get_options(self):
+        return {
+            "remove_tags": sorted(self.remove_tags),
+            "unwrap_tags": sorted(self.unwrap_tags),
+        }
 
     def _simplify(self):
         """simplify what was returned from requests
 
         :param response: a requests response object
         """
+        # extracting and simplifying change the tree in place, so it is taken out
+        # of the cache first and .soup will parse body again if it is needed
         soup = self.soup
-        self.simplify_document(soup)
-        self.simplify_tags(soup)
-        self.simplify_attrs(soup)
+        self.release_soup()
+
+        with self.timer("extract"):
+            fields = self.extract(soup)
+
+        soup = fields["content"]
+        with self.timer("simplify_document"):
+            self.simplify_document(soup)
+
+        with self.timer("simplify_tree"):
+            self.simplify_tree(soup)
         #self.fields["content"] = soup.prettify(formatter=self.simplify_strings)
 
-        fields = {key: self.body[key] for key in self.body if key != "content"}
         fields["content"] = soup.prettify(formatter=None)
         return fields
 
+    def extract(self, soup):
+        """Return the fields of the article, the content is simplified after this
+        returns so child classes that find the article themselves only need to
+        override this
+
+        by default body is a dict of already extracted fields (eg, what Mercury
+        returned) so its content was parsed into soup and the other fields are
+        used as is
+
+        :param soup: Soup, the parsed body
+        :returns: dict, the fields, the "content" key should be a Soup document
+        """
+        fields = {key: self.body[key] for key in self.body if key != "content"}
+        fields["content"] = soup
+        return fields
+
 #     def simplify_strings(self, s):
 #         pout.v(s)
 #         return s
@@ -108,45 +142,91 @@ class Article(Base):
         #pout.v("unwrapping")
         element.unwrap()
 
+    def simplify_tree(self, element):
+        """simplify_tags() and simplify_attrs() fused into one walk of the tree, so
+        each element is only visited once
+
+        if a child class overrides simplify_tags() or simplify_attrs() they are
+        called one after the other instead, so the overrides are still used
+
+        :param element: the beautiful soup element to simplify
+        :returns: element
+        """
+        klass = type(self)
+        if klass.simplify_tags != Article.simplify_tags or klass.simplify_attrs != Article.simplify_attrs:
+            self.simplify_tags(element)
+            self.simplify_attrs(element)
+            return element
+
+        return self._simplify_tags(element, clean_attrs=True)
+
     def simplify_tags(self, element):
-        # remove tags get completely removed from the tree, strings and all
-        remove_tags = [
-            "script",
-            "iframe",
-            "form",
-            "input",
-            "textarea",
-            "button",
-            "aside",
-        ]
-        for ename in remove_tags:
-            # TODO account for instagram and youtube embeds?
-            tag = element.find(ename)
-            while tag:
-                tag.decompose()
-                tag = element.find(ename)
-
-        # unwrapped tags are removed but strings between <tag> and </tag> are kept
-        unwrap_tags = [
-            "span",
-            "meta"
-        ]
-        for ename in unwrap_tags:
-            tag = element.find(ename)
-            while tag:
-                tag.unwrap()
-                tag = element.find(ename)
+        """remove and unwrap the tags in remove_tags and unwrap_tags
+
+        :param element: the beautiful soup element to simplify
+        :returns: element
+        """
+        return self._simplify_tags(element)
+
+    def _simplify_tags(self, element, clean_attrs=False):
+        """The walk simplify_tags() and simplify_tree() use
+
+        the tree is only walked once, the matching tags are gathered while walking
+        and then removed/unwrapped afterwards so no search ever has to restart from
+        the top of the document
+
+        :param element: the beautiful soup element to simplify
+        :param clean_attrs: bool, True to also strip the unsupported attributes of
+            every tag that is kept while walking, see simplify_attrs()
+        :returns: element
+        """
+        remove_tags = self.remove_tags
+        unwrap_tags = self.unwrap_tags
+        clean_element = Attributes.clean_element
+        removes = []
+        unwraps = []
+
+        stack = list(element.contents)
+        while stack:
+            tag = stack.pop()
+            name = tag.name
+            if name is None:
+                # we have a string
+                continue
+
+            if name in remove_tags:
+                # TODO account for instagram and youtube embeds?
+                # nothing under a removed tag survives so there is no need to
+                # look at its children
+                removes.append(tag)
+
+            else:
+                if name in unwrap_tags:
+                    unwraps.append(tag)
+
+                elif clean_attrs:
+                    clean_element(tag)
+
+                stack.extend(tag.contents)
+
+        for tag in removes:
+            tag.decompose()
+
+        for tag in unwraps:
+            tag.unwrap()
 
         return element
 
     def simplify_attrs(self, element):
-        for tag in element:
-            while tag:
-                if not isinstance(tag, NavigableString):
-                    attr = Attributes(tag)
-                    attr.clean()
-                tag = tag.next_element
-                #tag = tag.next
+        """strip the attributes that aren't supported from every tag under element
+
+        :param element: the beautiful soup element to simplify
+        :returns: element
+        """
+        clean_element = Attributes.clean_element
+        for tag in element.find_all(True):
+            clean_element(tag)
+        return element
 
 
 class Mercury(Article):
@@ -173,7 +253,7 @@ class Mercury(Article):
             'next_page_url': None
         }
     """
-    def _fetch(self):
+    def get_request(self):
         headers = {
             "x-api-key": os.environ["PLAIN_MERCURY_KEY"],
         }
@@ -181,15 +261,514 @@ class Mercury(Article):
             "url": self.url
         }
 
-        return requests.get(
-            "https://mercury.postlight.com/parser",
-            params=params,
-            headers=headers
-        )
+        return "https://mercury.postlight.com/parser", {"params": params, "headers": headers}
 
     def _parse(self, response):
         d = response.json()
         return d
 
 
+class Readability(Article):
+    """Finds the article in the raw html of a page without calling out to any third
+    party service, the fields are the same ones Mercury returns
+
+    this is the order of operations:
+
+        1 - the title, author, date, image and excerpt come from the json-ld,
+            opengraph, twitter, parsely, and other <meta> tags of the page, falling
+            back to the <title>, <h1>, <time>, and rel="author" elements
+        2 - the content is the element whose paragraphs have the most text, this
+            is scored like Arc90's readability, <article> elements and elements
+            whose class/id look like content get a head start
+        3 - the content is simplified like any other Article
+
+    all the information is gathered in one walk of the tree
+
+    :Example:
+        a = Readability(url) # or Readability(url, html) if you already have the html
+        fields = a.parse()
+        print(fields["title"], fields["word_count"])
+    """
+
+    # the contents of these tags are never part of the article
+    skip_tags = set([
+        "script",
+        "style",
+        "noscript",
+        "template",
+        "svg",
+    ])
+
+    # paragraphs in these tags are never part of the article
+    unlikely_tags = set([
+        "nav",
+        "aside",
+        "footer",
+        "form",
+        "button",
+        "select",
+        "textarea",
+        "iframe",
+    ])
+
+    # elements whose class or id match unlikely (and not maybe) are skipped like
+    # unlikely_tags, see https://github.com/mozilla/readability
+    unlikely_regex = re.compile(
+        r"-ad-|banner|breadcrumbs|combx|comment|community|cover-wrap|disqus|extra|"
+        r"footer|gdpr|legends|menu|navigation|related|remark|replies|rss|shoutbox|"
+        r"sidebar|skyscraper|social|sponsor|supplemental|ad-break|agegate|pagination|"
+        r"pager|popup|promo|share|newsletter|subscribe",
+        re.I
+    )
+    maybe_regex = re.compile(r"and|article|body|column|content|main|shadow", re.I)
+
+    # class/id that make an element more or less likely to be the content
+    positive_regex = re.compile(
+        r"article|body|content|entry|hentry|h-entry|main|page|post|text|blog|story",
+        re.I
+    )
+    negative_regex = re.compile(
+        r"hidden|banner|combx|comment|com-|contact|foot|footer|footnote|masthead|"
+        r"media|meta|outbrain|promo|related|scroll|share|shoutbox|sidebar|"
+        r"skyscraper|sponsor|shopping|tags|tool|widget",
+        re.I
+    )
+
+    # the base score of a candidate by its tag name
+    tag_scores = {
+        "article": 10,
+        "div": 5,
+        "section": 5,
+        "pre": 3,
+        "td": 3,
+        "blockquote": 3,
+        "address": -3,
+        "ol": -3,
+        "ul": -3,
+        "dl": -3,
+        "dd": -3,
+        "dt": -3,
+        "li": -3,
+        "form": -3,
+        "h1": -5,
+        "h2": -5,
+        "h3": -5,
+        "h4": -5,
+        "h5": -5,
+        "h6": -5,
+        "th": -5,
+    }
+
+    # a <div> whose own text (its strings and these children) is long enough is
+    # scored like a paragraph, lots of pages use <br> instead of <p>
+    inline_tags = set([
+        "a",
+        "abbr",
+        "b",
+        "br",
+        "cite",
+        "code",
+        "em",
+        "i",
+        "mark",
+        "q",
+        "s",
+        "small",
+        "span",
+        "strong",
+        "sub",
+        "sup",
+        "time",
+        "u",
+    ])
+
+    # paragraphs shorter than this aren't scored
+    min_paragraph_length = 25
+
+    # how long the excerpt is when the page doesn't have a description
+    excerpt_length = 200
+
+    # the meta names (property, name, or itemprop) each field is taken from, in
+    # the order they are checked
+    meta_fields = {
+        "title": ["og:title", "twitter:title", "parsely-title", "sailthru.title", "headline"],
+        "author": ["author", "parsely-author", "sailthru.author", "byl", "dc.creator", "article:author"],
+        "date_published": [
+            "article:published_time",
+            "parsely-pub-date",
+            "datepublished",
+            "sailthru.date",
+            "dc.date",
+            "date",
+        ],
+        "lead_image_url": ["og:image", "og:image:url", "twitter:image", "twitter:image:src", "parsely-image-url", "image"],
+        "excerpt": ["og:description", "twitter:description", "description"],
+        "url": ["og:url", "parsely-link"],
+    }
+
+    def create_soup(self):
+        return Soup(self.body, self.features, parse_only=self.get_parse_only())
+
+    def get_options(self):
+        options = super(Readability, self).get_options()
+        # the url, domain, and relative links are resolved against the url, so the
+        # same body at another url has different fields
+        options["url"] = self.url
+        return options
+
+    def extract(self, soup):
+        page = self.find_page(soup)
+        content = self.find_content(page)
+        text = content.get_text(" ")
+        url = self.find_url(page)
+
+        fields = {
+            "url": url,
+            "domain": parse.urlparse(url).hostname,
+            "title": self.find_title(page),
+            "author": self.find_author(page),
+            "date_published": self.find_value(page, "date_published"),
+            "lead_image_url": self.find_lead_image_url(page, content, url),
+            "excerpt": self.find_excerpt(page, text),
+            "word_count": len(text.split()),
+            "direction": page["direction"],
+            "dek": None,
+            "next_page_url": None,
+            "total_pages": 1,
+            "rendered_pages": 1,
+            "content": content,
+        }
+        return fields
+
+    def is_unlikely(self, element):
+        """True if element's class/id say it isn't part of the article"""
+        attrs = element.attrs
+        if not attrs: return False
+        match = " ".join(attrs.get("class", [])) + " " + attrs.get("id", "")
+        return bool(self.unlikely_regex.search(match)) and not self.maybe_regex.search(match)
+
+    def get_class_weight(self, element):
+        weight = 0
+        attrs = element.attrs
+        if attrs:
+            for match in [" ".join(attrs.get("class", [])), attrs.get("id", "")]:
+                if match:
+                    if self.negative_regex.search(match):
+                        weight -= 25
+                    if self.positive_regex.search(match):
+                        weight += 25
+        return weight
+
+    def find_page(self, soup):
+        """Walk the whole document once and gather everything the fields are found
+        from, paragraphs are scored as they are found
+
+        :param soup: Soup, the whole page
+        :returns: dict
+        """
+        page = {
+            "soup": soup,
+            "meta": {},
+            "ld": {},
+            "title": "",
+            "h1": "",
+            "canonical": "",
+            "authors": [],
+            "times": [],
+            "images": [],
+            "direction": "ltr",
+            # id(element) -> [element, score]
+            "candidates": {},
+        }
+        meta = page["meta"]
+        candidates = page["candidates"]
+
+        # (element, likely), likely is False when element is inside something
+        # that isn't part of the article
+        stack = [(el, True) for el in reversed(soup.contents)]
+        while stack:
+            element, likely = stack.pop()
+            name = element.name
+            if name is None:
+                continue
+
+            attrs = element.attrs
+            if name == "meta":
+                key = attrs.get("property", None) or attrs.get("name", None) or attrs.get("itemprop", None)
+                value = attrs.get("content", None)
+                if key and value:
+                    meta.setdefault(key.lower(), value.strip())
+                continue
+
+            elif name == "script":
+                if attrs.get("type", "") == "application/ld+json":
+                    self.find_ld(element.string, page["ld"])
+                continue
+
+            elif name in self.skip_tags:
+                continue
+
+            elif name == "title":
+                if not page["title"]:
+                    page["title"] = element.get_text(strip=True)
+                continue
 
+            elif name == "link":
+                rel = attrs.get("rel", [])
+                if "canonical" in rel and not page["canonical"]:
+                    page["canonical"] = attrs.get("href", "")
+                continue
+
+            elif name == "html":
+                page["direction"] = attrs.get("dir", "ltr")
+
+            if likely:
+                likely = name not in self.unlikely_tags and not self.is_unlikely(element)
+
+            if likely:
+                if name == "h1" and not page["h1"]:
+                    page["h1"] = element.get_text(" ", strip=True)
+
+                elif name == "time":
+                    page["times"].append(attrs.get("datetime", "") or element.get_text(strip=True))
+
+                elif name == "img":
+                    page["images"].append(element)
+
+                if "author" in attrs.get("rel", []) or attrs.get("itemprop", "") == "author":
+                    page["authors"].append(element)
+
+                if name == "p" or name == "pre":
+                    self.score_paragraph(element, element.get_text(), candidates)
+
+                elif name == "div":
+                    self.score_paragraph(element, self.get_own_text(element), candidates)
+
+            stack.extend((el, likely) for el in reversed(element.contents))
+
+        return page
+
+    def find_ld(self, data, ld):
+        """Merge the article fields of json-ld data into ld
+
+        https://schema.org/Article
+
+        :param data: str, the contents of a <script type="application/ld+json">
+        :param ld: dict, the found values are set into this
+        """
+        try:
+            data = json.loads(data or "")
+
+        except ValueError:
+            return
+
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            if not isinstance(item, dict): continue
+            if "@graph" in item:
+                items.extend(item["@graph"])
+                continue
+
+            if "Article" not in String(item.get("@type", "")) and "Posting" not in String(item.get("@type", "")):
+                continue
+
+            for key, field in [("headline", "title"), ("datePublished", "date_published"), ("description", "excerpt"), ("url", "url")]:
+                value = item.get(key, None)
+                if value and isinstance(value, String):
+                    ld.setdefault(field, value)
+
+            author = item.get("author", None)
+            if isinstance(author, list) and author:
+                author = author[0]
+            if isinstance(author, dict):
+                author = author.get("name", None)
+            if author and isinstance(author, String):
+                ld.setdefault("author", author)
+
+            image = item.get("image", None)
+            if isinstance(image, list) and image:
+                image = image[0]
+            if isinstance(image, dict):
+                image = image.get("url", None)
+            if image and isinstance(image, String):
+                ld.setdefault("lead_image_url", image)
+
+    def get_own_text(self, element):
+        """Return the text of element that isn't in one of its block children"""
+        inline_tags = self.inline_tags
+        parts = []
+        for child in element.contents:
+            name = child.name
+            if name is None:
+                if type(child) is NavigableString:
+                    parts.append(child)
+
+            elif name in inline_tags:
+                parts.append(child.get_text())
+
+        return "".join(parts)
+
+    def score_paragraph(self, element, text, candidates):
+        """Add the score of paragraph element to its parent and (half of it to) its
+        grandparent, these ancestors are the candidates for the content
+
+        :param element: bs4 element, the <p>, <pre>, or <div>
+        :param text: str, the text of the paragraph
+        :param candidates: dict, see find_page()
+        """
+        length = len(text.strip())
+        if length < self.min_paragraph_length: return
+
+        score = 1 + text.count(",") + min(length // 100, 3)
+        for i, ancestor in enumerate([element.parent, element.parent.parent if element.parent else None]):
+            if ancestor is None or ancestor.name == "[document]":
+                break
+
+            key = id(ancestor)
+            if key not in candidates:
+                candidates[key] = [
+                    ancestor,
+                    self.tag_scores.get(ancestor.name, 0) + self.get_class_weight(ancestor),
+                ]
+            candidates[key][1] += score / (i + 1)
+
+    def get_link_density(self, element):
+        """Return how much of the text of element is link text, 0.0 to 1.0"""
+        length = len(element.get_text())
+        if not length: return 0.0
+        link_length = sum(len(a.get_text()) for a in element.find_all("a"))
+        return link_length / length
+
+    def find_content(self, page):
+        """Return the article content as a new Soup document, this is the top
+        scoring candidate (and any of its siblings that look like they are part of
+        the article)
+
+        :param page: dict, see find_page()
+        :returns: Soup
+        """
+        soup = page["soup"]
+        ranked = sorted(page["candidates"].values(), key=lambda c: c[1], reverse=True)
+
+        top = None
+        top_score = 0
+        scores = {}
+        # link density is only checked for the best few candidates
+        for element, score in ranked[:5]:
+            score *= (1.0 - self.get_link_density(element))
+            scores[id(element)] = score
+            if top is None or score > top_score:
+                top, top_score = element, score
+
+        if top is None:
+            top = soup.find("article") or soup.find("body") or soup
+
+        elements = [top]
+        parent = top.parent
+        if parent is not None and parent.name != "[document]":
+            # the article can be split into sibling sections (eg, around ads)
+            threshold = max(10, top_score * 0.2)
+            elements = []
+            for sibling in parent.children:
+                if sibling is top:
+                    elements.append(sibling)
+
+                elif sibling.name:
+                    score = scores.get(id(sibling), None)
+                    if score is None:
+                        candidate = page["candidates"].get(id(sibling), None)
+                        score = candidate[1] if candidate else 0
+
+                    if score >= threshold:
+                        elements.append(sibling)
+
+                    elif sibling.name == "p":
+                        text = sibling.get_text(strip=True)
+                        density = self.get_link_density(sibling)
+                        if len(text) > 80 and density < 0.25:
+                            elements.append(sibling)
+
+                        elif text and density == 0 and re.search(r"\.( |$)", text):
+                            elements.append(sibling)
+
+        content = Soup("", self.features)
+        if len(elements) == 1:
+            content.append(elements[0].extract())
+
+        else:
+            div = content.new_tag("div")
+            for element in elements:
+                div.append(element.extract())
+            content.append(div)
+
+        return content
+
+    def find_value(self, page, field):
+        """Return the value of field from the json-ld or the meta tags of the page"""
+        ret = page["ld"].get(field, None)
+        if not ret:
+            meta = page["meta"]
+            for key in self.meta_fields[field]:
+                ret = meta.get(key, None)
+                if ret:
+                    break
+
+        if not ret and field == "date_published" and page["times"]:
+            ret = page["times"][0]
+
+        return ret or None
+
+    def find_url(self, page):
+        url = page["ld"].get("url", None) or page["meta"].get("og:url", None) or page["canonical"]
+        return parse.urljoin(self.url, url) if url else self.url
+
+    def find_title(self, page):
+        ret = self.find_value(page, "title")
+        if not ret:
+            ret = page["title"]
+            # strip the site name from titles like "title - site"
+            m = re.match(r"^(.+?)\s+[\-|–—:]\s+[^\-|–—:]+$", ret)
+            if m and len(m.group(1).split()) >= 3:
+                ret = m.group(1)
+
+            if not ret:
+                ret = page["h1"]
+
+        return ret or None
+
+    def find_author(self, page):
+        ret = self.find_value(page, "author")
+        if ret and re.match(r"^https?://", ret):
+            # article:author is usually the url of the author's page
+            ret = None
+
+        if not ret:
+            for element in page["authors"]:
+                ret = element.get("content", None) or element.get_text(" ", strip=True)
+                if ret:
+                    break
+
+        if ret:
+            ret = re.sub(r"^by\s+", "", ret.strip(), flags=re.I)
+
+        return ret or None
+
+    def find_lead_image_url(self, page, content, url):
+        # the opengraph image is picked by the site to represent the page so it is
+        # preferred over the json-ld one
+        ret = page["meta"].get("og:image", None) or self.find_value(page, "lead_image_url")
+        if not ret:
+            img = content.find("img", src=True)
+            if img:
+                ret = img["src"]
+
+        return parse.urljoin(url, ret) if ret else None
+
+    def find_excerpt(self, page, text):
+        ret = self.find_value(page, "excerpt")
+        if not ret:
+            ret = " ".join(text.split())
+            if len(ret) > self.excerpt_length:
+                ret = ret[:self.excerpt_length].rsplit(" ", 1)[0] + "…"
+
+        return ret or None
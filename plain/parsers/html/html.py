@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
 
+from bs4.element import PreformattedString
+
 from ..base import Soup
 from ...compat import String, HTMLParser, unescape
 
@@ -63,6 +65,50 @@ class HTMLCleaner(HTMLParser):
         s.feed(html)
         return s.get_data()
 
+    @classmethod
+    def strip_element(cls, element, block_sep="\n", inline_sep="", img_as_data=False):
+        """strip_tags for an already parsed bs4 element, this produces the same text
+        strip_tags would for the element's inner html but it walks the tree directly
+        instead of serializing the element and parsing the html again
+
+        :param element: bs4 element, the contents of this element will be stripped
+        :param block_sep: str, added after every block level element
+        :param inline_sep: str, added after every other element
+        :param img_as_data: bool, True to add the src of <img> elements to the text
+        :returns: str
+        """
+        fed = []
+        block_tagnames = cls.BLOCK_TAGNAMES
+        stack = [(None, iter(element.contents))]
+        while stack:
+            tag, children = stack[-1]
+            for child in children:
+                if child.name is None:
+                    # comments, doctypes, cdata, etc. are ignored by strip_tags also
+                    if not isinstance(child, PreformattedString):
+                        fed.append(child)
+
+                else:
+                    if img_as_data and child.name == "img":
+                        src = child.get("src", None)
+                        if src is not None:
+                            fed.append("\n{}\n".format(src))
+
+                    stack.append((child, iter(child.contents)))
+                    break
+
+            else:
+                stack.pop()
+                if tag is not None:
+                    if tag.name in block_tagnames:
+                        if block_sep:
+                            fed.append(block_sep)
+                    else:
+                        if inline_sep:
+                            fed.append(inline_sep)
+
+        return "".join(fed)
+
     def __init__(self, block_sep="\n", inline_sep="", img_as_data=False):
         self.reset()
         self.fed = []
@@ -115,7 +161,167 @@ class HTML(String):
 
     def __new__(cls, html, keep_images=False):
         s = HTMLCleaner.strip_tags(html, img_as_data=keep_images).strip()
-        instance = super(HTML, cls).__new__(cls, s)
+        return cls.from_text(s, html)
+
+    @classmethod
+    def from_element(cls, element, keep_images=False):
+        """create an instance from a bs4 element, this is the same as
+        HTML(Soup.inner_html(element)) but the text is pulled straight from the
+        element instead of re-parsing its html
+
+        :param element: bs4 element, the element's inner html will be used
+        :param keep_images: bool, same as __new__
+        :returns: HTML instance
+        """
+        s = HTMLCleaner.strip_element(element, img_as_data=keep_images).strip()
+        return cls.from_text(s, Soup.inner_html(element))
+
+    @classmethod
+    def from_text(cls, text, html):
+        """create an instance from already stripped text
+
+        :param text: str, the plain text version of html
+        :param html: str, the original html
+        :returns: HTML instance
+        """
+        instance = super(HTML, cls).__new__(cls, text)
         instance.html = html
         return instance
 
+    def __reduce__(self):
+        # the default str pickling would pass the stripped text back into __new__
+        # and strip it again, which mangles text like "&lt;b&gt;"
+        return (type(self).from_text, (String(self), self.html))
+
+
+
+class LazyHTML(object):
+    """A lazy version of HTML, it holds onto the bs4 element (or html string) and only
+    strips it into plain text, or serializes its html, the first time that value is
+    asked for, the value is then remembered
+
+    it acts like the plain text str (comparisons, sorting, hashing, len, indexing,
+    +, and str methods all use the plain text) but it isn't an actual str, so
+    anything that checks for a real str (eg, ",".join(values), isinstance, or
+    json.dumps) needs str(value) first. When pickled it becomes an HTML instance
+
+    .soup is the exception, like HTML.soup it parses the html into a new tree every
+    time so the caller can change the tree without changing this value
+
+    Since it holds a reference to the element the whole parsed document the element
+    belongs to stays in memory until every LazyHTML created from it is gone
+    """
+    __slots__ = ("element", "keep_images", "_text", "_html", "_unescaped_html")
+
+    @property
+    def text(self):
+        if self._text is None:
+            if self.element is None:
+                text = HTMLCleaner.strip_tags(self._html, img_as_data=self.keep_images)
+            else:
+                text = HTMLCleaner.strip_element(self.element, img_as_data=self.keep_images)
+            self._text = text.strip()
+        return self._text
+
+    @property
+    def html(self):
+        if self._html is None:
+            self._html = Soup.inner_html(self.element)
+        return self._html
+
+    @property
+    def soup(self):
+        return Soup(self.html)
+
+    @property
+    def unescaped_html(self):
+        if self._unescaped_html is None:
+            self._unescaped_html = HTMLCleaner.unescape(self.html)
+        return self._unescaped_html
+
+    def __init__(self, html=None, keep_images=False, element=None):
+        """
+        :param html: str, the html, this or element is needed
+        :param keep_images: bool, same as HTML.__new__
+        :param element: bs4 element, its inner html is the html
+        """
+        self.element = element
+        self.keep_images = keep_images
+        self._text = None
+        self._html = html
+        self._unescaped_html = None
+
+    @classmethod
+    def from_element(cls, element, keep_images=False):
+        return cls(element=element, keep_images=keep_images)
+
+    def __str__(self):
+        return self.text
+
+    def __unicode__(self):
+        return self.text
+
+    def __repr__(self):
+        return repr(self.text)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyHTML):
+            other = other.text
+        return self.text == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        if isinstance(other, LazyHTML):
+            other = other.text
+        return self.text < other
+
+    def __le__(self, other):
+        if isinstance(other, LazyHTML):
+            other = other.text
+        return self.text <= other
+
+    def __gt__(self, other):
+        if isinstance(other, LazyHTML):
+            other = other.text
+        return self.text > other
+
+    def __ge__(self, other):
+        if isinstance(other, LazyHTML):
+            other = other.text
+        return self.text >= other
+
+    def __add__(self, other):
+        if isinstance(other, LazyHTML):
+            other = other.text
+        return self.text + other
+
+    def __radd__(self, other):
+        return other + self.text
+
+    def __getitem__(self, k):
+        return self.text[k]
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def __len__(self):
+        return len(self.text)
+
+    def __bool__(self):
+        return bool(self.text)
+    __nonzero__ = __bool__
+
+    def __contains__(self, s):
+        return s in self.text
+
+    def __iter__(self):
+        return iter(self.text)
+
+    def __getattr__(self, k):
+        # anything else (eg, strip, split, lower) comes from the plain text
+        return getattr(self.text, k)
+
+    def __reduce__(self):
+        return (HTML.from_text, (self.text, self.html))
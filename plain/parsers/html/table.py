@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
-from collections import defaultdict, OrderedDict
+from collections import defaultdict, OrderedDict, deque
+import codecs
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from bs4 import SoupStrainer
+from bs4.dammit import EncodingDetector
 
 from ..base import Base
-from .html import HTML
-from ...soup import Soup
+from .html import HTML, LazyHTML
+from ...compat import HTMLParser, String, Bytes, is_py3, unescape
 
 
 class Headers(object):
@@ -14,6 +24,12 @@ class Headers(object):
         self.headers = defaultdict(dict)
         self.colgroups = defaultdict(list)
         self.keys = defaultdict(dict)
+        self.invalidate()
+
+    def invalidate(self):
+        """the headers changed, so everything compiled from the old ones is dropped"""
+        self.compiled = None
+        self.schemas = {}
 
     def add_colgroup(self, offset, span, text):
         """Add a colgroup col value
@@ -24,6 +40,7 @@ class Headers(object):
         """
         for i in range(offset, offset + span):
             self.colgroups[i].append(text)
+        self.invalidate()
 
     def set_key(self, name, index, text):
         """Set the key for the current row
@@ -35,6 +52,7 @@ class Headers(object):
         if not text:
             text = str(index)
         self.keys[name][index] = text
+        self.invalidate()
 
     def set_header(self, name, offset, span, text):
         """set a global table header, a global table header is a header that spans
@@ -48,27 +66,94 @@ class Headers(object):
         """
         for i in range(offset, offset + span):
             self.headers[name][i] = text
+        self.invalidate()
+
+    def compile(self):
+        """Merge the keys and headers of every row class into one key and one headers
+        list per column, this only happens once after the headers change instead of
+        the row classes being checked for every column of every row
+
+        :returns: tuple, (keys, headers), dicts of column index -> key and column
+            index -> headers list, columns without a key or headers aren't in them
+        """
+        if self.compiled is None:
+            keys = {}
+            for name in self.keys:
+                for index, text in self.keys[name].items():
+                    # the first row class that has a key for the column wins
+                    keys.setdefault(index, text)
+
+            headers = defaultdict(list)
+            for name in self.headers:
+                for index, text in self.headers[name].items():
+                    headers[index].append(text)
+
+            self.compiled = (keys, dict(headers))
+        return self.compiled
 
     def get_key(self, index):
         """Return the key's value at the column index"""
-        ret = str(index)
-        for name in self.keys.keys():
-            if index in self.keys[name]:
-                ret = self.keys[name][index]
-                break
-        return ret
+        keys, headers = self.compile()
+        return keys.get(index, None) or str(index)
 
     def get_headers(self, index):
         """Return all the headers that apply to the column index"""
-        ret = []
-        for name in self.headers.keys():
-            try:
-                ret.append(self.headers[name][index])
+        keys, headers = self.compile()
+        return list(headers.get(index, []))
 
-            except KeyError:
-                pass
+    def get_schema(self, size):
+        """Return the Schema of a row that is size columns wide, the schema is only
+        built once and then shared by every row until the headers change
 
-        return ret
+        :param size: int, how many columns
+        :returns: Schema
+        """
+        schema = self.schemas.get(size, None)
+        if schema is None:
+            keys, headers = self.compile()
+            schema = Schema(
+                [keys.get(i, None) or str(i) for i in range(size)],
+                [headers.get(i, ()) for i in range(size)],
+            )
+            self.schemas[size] = schema
+        return schema
+
+
+class Schema(object):
+    """The key and headers of every column of a row, this is shared by every row
+    that was parsed while the same headers were in effect
+
+    A key can be used by more than one column, in that case (just like Row) the key
+    only appears once, at the position of its first column, and it has the value of
+    its last column
+    """
+    def __init__(self, keys, headers):
+        """
+        :param keys: list, the key of each column
+        :param headers: list, the headers of each column, they are frozen into
+            tuples since the schema is shared, rows get their own list copies
+        """
+        self.keys = tuple(keys)
+        self.headers = tuple(tuple(hs) for hs in headers)
+
+        # key -> the column index that holds the value of key
+        self.lookup = OrderedDict()
+        for i, k in enumerate(self.keys):
+            self.lookup[k] = i
+        self.indexes = tuple(self.lookup.values())
+
+        # (key, headers, index) of each column a Row has, this is all a content row
+        # needs to zip its values against
+        self.columns = tuple((k, self.headers[i], i) for k, i in self.lookup.items())
+
+        # header -> the column indexes that have that header, this is what makes
+        # aggregated lookups like row["Population"] a direct gather
+        header_index = defaultdict(list)
+        for i in self.indexes:
+            for h in self.headers[i]:
+                if not header_index[h] or header_index[h][-1] != i:
+                    header_index[h].append(i)
+        self.header_index = {h: tuple(ii) for h, ii in header_index.items()}
 
 
 class Row(OrderedDict):
@@ -83,6 +168,10 @@ class Row(OrderedDict):
     get all the row keys:
         self.keys()
     """
+    # the Schema this row was created from, when set header lookups use its index
+    # instead of checking the headers of every column
+    schema = None
+
     def __getitem__(self, k):
         k = str(k)
         try:
@@ -91,10 +180,19 @@ class Row(OrderedDict):
         except KeyError:
             # check headers and aggregate the values that match a header of k
             ret = {"headers": [k], "value": []}
-            for d in self.values():
-                if k in d["headers"]:
-                    if d["value"] is not None:
-                        ret["value"].append(d["value"])
+            schema = self.schema
+            if schema is None:
+                for d in self.values():
+                    if k in d["headers"]:
+                        if d["value"] is not None:
+                            ret["value"].append(d["value"])
+
+            else:
+                getitem = super(Row, self).__getitem__
+                for i in schema.header_index.get(k, ()):
+                    v = getitem(schema.keys[i])["value"]
+                    if v is not None:
+                        ret["value"].append(v)
 
             if not ret["value"]:
                 raise
@@ -116,16 +214,213 @@ class Row(OrderedDict):
         raise NotImplementedError()
 
 
+class CompactRow(object):
+    """A memory efficient Row, the values are held in a tuple and the keys and headers
+    are in a Schema that is shared with the other rows of the table, so no dicts are
+    created until a column is actually asked for
+
+    This has the same interface as Row (minus the methods that would modify it)
+
+    :Example:
+        t = Table(url, body, compact=True)
+    """
+    __slots__ = ("schema", "row")
+
+    def __init__(self, schema, row):
+        """
+        :param schema: Schema
+        :param row: tuple, the value of every column
+        """
+        self.schema = schema
+        self.row = row
+
+    def column(self, i):
+        return {
+            "headers": list(self.schema.headers[i]),
+            "value": self.row[i],
+        }
+
+    def __getitem__(self, k):
+        k = str(k)
+        schema = self.schema
+        i = schema.lookup.get(k, None)
+        if i is not None:
+            return self.column(i)
+
+        # aggregate the values of the columns that have a header of k
+        ret = {"headers": [k], "value": []}
+        for i in schema.header_index.get(k, ()):
+            if self.row[i] is not None:
+                ret["value"].append(self.row[i])
+
+        if not ret["value"]:
+            raise KeyError(k)
+
+        return ret
+
+    def __contains__(self, k):
+        return k in self.schema.lookup
+
+    def __iter__(self):
+        return iter(self.schema.lookup)
+
+    def __len__(self):
+        return len(self.schema.lookup)
+
+    def __eq__(self, other):
+        if isinstance(other, CompactRow):
+            other = other.items()
+        return OrderedDict(self.items()) == OrderedDict(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, list(self.items()))
+
+    def keys(self):
+        return list(self.schema.lookup)
+
+    def values(self):
+        return [self.column(i) for i in self.schema.indexes]
+
+    def items(self):
+        return [(k, self.column(i)) for k, i in self.schema.lookup.items()]
+
+    def columns(self):
+        return (self.row[i] for i in self.schema.indexes)
+
+    def get(self, k, default_val=None):
+        try:
+            ret = self[k]
+
+        except KeyError:
+            ret = default_val
+        return ret
+
+    def pop(self, *args, **kwargs):
+        raise NotImplementedError()
+
+
 class Rows(list):
     """This represents the entire table object, I would like to have named it Table
     but I want the parser to be named Table, I thought about TableTable but since
     a table is mainly a collection of Rows I decided on this name, it's basically
     a list but has a caption property so you can get that value if it exists
     """
+    # what infer_column() accepts as an int or float, an optional sign, digits with
+    # optional "," thousands groups, and for floats a decimal and/or an exponent
+    int_regex = re.compile(r"^[+-]?(?:\d{1,3}(?:,\d{3})+|\d+)$")
+    float_regex = re.compile(
+        r"^[+-]?(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?$"
+    )
+
     def __init__(self, caption, rows):
         super(Rows, self).__init__(rows)
         self.caption = caption
 
+    def row_items(self, row):
+        """yield the (key, value) of every column of row without building any of the
+        {"headers": ..., "value": ...} column dicts that aren't already there"""
+        if isinstance(row, CompactRow):
+            values = row.row
+            for k, i in row.schema.lookup.items():
+                yield k, values[i]
+
+        else:
+            for k, d in OrderedDict.items(row):
+                yield k, d["value"]
+
+    def to_columns(self, infer=False):
+        """Return the table as columns instead of rows
+
+        :Example:
+            columns = t.tables[0].to_columns(infer=True)
+            total = sum(v for v in columns["Population"] if v is not None)
+
+        :param infer: bool, True to convert the columns where every value looks like
+            a number into int or float values (empty values become None)
+        :returns: OrderedDict, key -> list of values, every list is len(self) long
+            and rows that don't have a key get None in that column
+        """
+        columns = OrderedDict()
+        for y, row in enumerate(self):
+            for k, v in self.row_items(row):
+                column = columns.get(k, None)
+                if column is None:
+                    column = [None] * y
+                    columns[k] = column
+                column.append(v)
+
+            for column in columns.values():
+                if len(column) <= y:
+                    column.append(None)
+
+        if infer:
+            for k, column in columns.items():
+                columns[k] = self.infer_column(column)
+
+        return columns
+
+    def infer_column(self, column):
+        """convert the values of column to int or float if they all look like numbers
+        (thousands separators are ignored), if they don't the column is returned as is
+
+        only plain numbers (see int_regex and float_regex) count, so text that python
+        would also convert (eg, "nan", "inf", or "1_000") stays text
+
+        :param column: list
+        :returns: list
+        """
+        for convert, regex in [(int, self.int_regex), (float, self.float_regex)]:
+            ret = []
+            for v in column:
+                v = String(v).strip() if v is not None else ""
+                if not v:
+                    ret.append(None)
+
+                elif regex.match(v):
+                    ret.append(convert(v.replace(",", "")))
+
+                else:
+                    break
+
+            else:
+                if any(v is not None for v in ret):
+                    return ret
+
+        return column
+
+    def to_arrays(self, infer=True):
+        """Return the table as numpy arrays, this needs numpy installed
+
+        :param infer: bool, see to_columns, int columns that have empty values become
+            float columns with nan for the empty values
+        :returns: OrderedDict, key -> numpy.ndarray
+        """
+        if numpy is None:
+            raise ImportError("to_arrays() needs numpy installed")
+
+        arrays = OrderedDict()
+        for k, column in self.to_columns(infer=infer).items():
+            kinds = set(type(v) for v in column if v is not None)
+            if kinds == set([int]) and None not in column:
+                arrays[k] = numpy.array(column, dtype=numpy.int64)
+
+            elif kinds and kinds <= set([int, float]):
+                arrays[k] = numpy.array(
+                    [numpy.nan if v is None else v for v in column],
+                    dtype=numpy.float64
+                )
+
+            else:
+                arrays[k] = numpy.array(
+                    [None if v is None else String(v) for v in column],
+                    dtype=object
+                )
+
+        return arrays
+
     def __getitem__(self, k):
         if k == "caption":
             return self.caption
@@ -137,6 +432,391 @@ class Rows(list):
             return super(Rows, self).__getitem__(k)
 
 
+class GridCell(object):
+    """A td or th element that has been placed in a Grid"""
+    __slots__ = ("element", "x", "y", "colspan", "rowspan", "value")
+
+    def __init__(self, element, x, y, colspan, rowspan):
+        self.element = element
+        self.x = x
+        self.y = y
+        self.colspan = colspan
+        self.rowspan = rowspan
+        self.value = None
+
+
+class Grid(object):
+    """The cell occupancy grid of a table, this places each cell at the column it
+    belongs in taking the colspan and rowspan of every cell above and to the left of
+    it into account
+
+    Rows are added one at a time (in the order they appear in the table) so the grid
+    can be built in the same pass that walks the table. A rowspan can't cross the
+    boundary of a row group (thead, tbody, tfoot) so end_group() should be called
+    whenever one starts or ends
+
+    https://html.spec.whatwg.org/multipage/tables.html#forming-a-table
+    """
+
+    # the most columns/rows a cell can span, from the html spec
+    MAX_COLSPAN = 1000
+    MAX_ROWSPAN = 65534
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+
+        # column index -> the GridCell above that spans down into the next row
+        self.spans = {}
+
+    @classmethod
+    def get_span(cls, element, name, default=1):
+        """return the colspan, rowspan, or span value of element, default if it
+        isn't a number
+
+        :param element: bs4 element, StreamCell, or dict of attributes
+        """
+        try:
+            return int(element.get(name, default))
+
+        except (TypeError, ValueError):
+            return default
+
+    def add_row(self, elements):
+        """Place the td/th elements of the next row
+
+        :param elements: list, the td and th elements of the row (bs4 elements or
+            StreamCell instances)
+        :returns: tuple, (cells, slots), cells is the GridCell of each element and
+            slots has the GridCell that occupies each column of the row (or None
+            if nothing does), a cell that spans columns or rows is in each of the
+            slots it occupies
+        """
+        y = self.height
+        self.height += 1
+
+        slots = []
+        spans = self.spans
+        if spans:
+            for x, cell in list(spans.items()):
+                if cell.y + cell.rowspan <= y:
+                    del spans[x]
+
+                else:
+                    if x >= len(slots):
+                        slots.extend([None] * (x + 1 - len(slots)))
+                    slots[x] = cell
+
+        cells = []
+        x = 0
+        for element in elements:
+            while x < len(slots) and slots[x] is not None:
+                x += 1
+
+            colspan = min(max(self.get_span(element, "colspan"), 1), self.MAX_COLSPAN)
+            rowspan = min(self.get_span(element, "rowspan"), self.MAX_ROWSPAN)
+            if rowspan < 1:
+                # rowspan="0" spans to the end of the row group
+                rowspan = self.MAX_ROWSPAN
+
+            cell = GridCell(element, x, y, colspan, rowspan)
+            cells.append(cell)
+
+            end = x + colspan
+            if end > len(slots):
+                slots.extend([None] * (end - len(slots)))
+            for i in range(x, end):
+                slots[i] = cell
+                if rowspan > 1:
+                    spans[i] = cell
+
+            x = end
+
+        if len(slots) > self.width:
+            self.width = len(slots)
+
+        return cells, slots
+
+    def add_columns(self, width):
+        """make sure the grid is at least width columns wide (eg, from a colgroup)"""
+        if width > self.width:
+            self.width = width
+
+    def end_group(self):
+        """a row group ended, so nothing above can span into the rows that follow"""
+        self.spans = {}
+
+
+class StreamCell(object):
+    """A <td>, <th>, or <caption> found by TableStream, this has just enough of the
+    bs4 element interface (name, get(), get_text()) that the Table header methods
+    can use it"""
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+        if "class" in self.attrs:
+            # bs4 treats class as a multi-valued attribute
+            self.attrs["class"] = (self.attrs["class"] or "").split()
+        self.html = []
+        self.strings = []
+
+    def get(self, k, default=None):
+        return self.attrs.get(k, default)
+
+    def get_text(self, strip=False):
+        if strip:
+            return "".join(s.strip() for s in self.strings)
+        return "".join(self.strings)
+
+    def inner_html(self):
+        return "".join(self.html)
+
+
+class TableStream(HTMLParser):
+    """Incrementally parses html and builds the content rows of one <table> as the
+    html is fed in, completed rows are buffered until they are read with pop_rows()
+
+    Only the row that is currently being parsed is kept around, so memory use is
+    bounded by the width of the widest row instead of the size of the table
+
+    This is used by Table.stream(), see that method for more information
+    """
+
+    # these are serialized as <tag/> like bs4 does so the cell values strip the
+    # same way they do when they come from a bs4 tree
+    VOID_TAGNAMES = set([
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+    ])
+
+    def __init__(self, table, index=0):
+        """
+        :param table: Table instance, the parser whose header and row methods are used
+        :param index: int, the index of the table in the document (same as the
+            index of the table in Table.tables)
+        """
+        self.table = table
+        self.index = index
+        self.headers = Headers()
+        self.grid = Grid()
+        self.rows = deque()
+        self.caption = ""
+
+        self.table_count = -1
+        self.in_table = False
+        self.done = False
+        self.nested = 0 # how many tables deep we are inside the current cell
+        self.section = ""
+        self.colgroup_offset = 0
+        self.colgroup = None # "span" or "cols" while inside a <colgroup>
+        self.tr = None
+        self.cell = None
+        self.in_string = False
+
+        if is_py3:
+            super(TableStream, self).__init__(convert_charrefs=False)
+        else:
+            HTMLParser.__init__(self)
+
+    def pop_rows(self):
+        """yield and remove all the rows that have been completed so far"""
+        while self.rows:
+            yield self.rows.popleft()
+
+    def serialize_starttag(self, tag, attrs, close=False):
+        bits = [tag]
+        for k, v in attrs:
+            if v is None:
+                bits.append(k)
+            else:
+                v = v.replace("&", "&amp;").replace('"', "&quot;")
+                v = v.replace("<", "&lt;").replace(">", "&gt;")
+                bits.append('{}="{}"'.format(k, v))
+
+        if close or tag in self.VOID_TAGNAMES:
+            return "<{}/>".format(" ".join(bits))
+        return "<{}>".format(" ".join(bits))
+
+    def add_html(self, html):
+        self.cell.html.append(html)
+        self.in_string = False
+
+    def add_string(self, html, text):
+        self.cell.html.append(html)
+        if self.in_string:
+            self.cell.strings[-1] += text
+        else:
+            self.cell.strings.append(text)
+            self.in_string = True
+
+    def handle_starttag(self, tag, attrs):
+        if self.done: return
+
+        if tag == "table":
+            self.table_count += 1
+
+        if not self.in_table:
+            if tag == "table" and self.table_count == self.index:
+                self.in_table = True
+            return
+
+        if self.cell and self.nested:
+            if tag == "table":
+                self.nested += 1
+            self.add_html(self.serialize_starttag(tag, attrs))
+            return
+
+        if tag != "col":
+            # <col> is the only thing a colgroup can hold
+            self.colgroup = None
+
+        if tag in ["td", "th"]:
+            if self.tr is None:
+                self.tr = []
+            self.close_cell()
+            self.cell = StreamCell(tag, attrs)
+            self.tr.append(self.cell)
+
+        elif tag == "tr":
+            self.close_row()
+            self.tr = []
+
+        elif tag in ["thead", "tbody", "tfoot"]:
+            self.close_row()
+            self.grid.end_group()
+            self.section = tag
+
+        elif tag == "caption" and not self.cell:
+            self.cell = StreamCell(tag, attrs)
+
+        elif tag == "colgroup" and not self.cell:
+            attrs = dict(attrs)
+            span = Grid.get_span(attrs, "span", 0)
+            # like find_colgroup(), the <col> tags of a colgroup that has a span
+            # are ignored
+            self.colgroup = "span" if span else "cols"
+            if span:
+                text = attrs.get("class", "")
+                if text:
+                    self.headers.add_colgroup(self.colgroup_offset, span, text)
+                self.colgroup_offset += span
+                self.grid.add_columns(self.colgroup_offset)
+
+        elif tag == "col" and not self.cell:
+            if self.colgroup == "cols":
+                attrs = dict(attrs)
+                span = Grid.get_span(attrs, "span", 1)
+                text = attrs.get("class", "")
+                if text:
+                    self.headers.add_colgroup(self.colgroup_offset, span, text)
+                self.colgroup_offset += span
+                self.grid.add_columns(self.colgroup_offset)
+
+        elif self.cell:
+            if tag == "table":
+                self.nested += 1
+            self.add_html(self.serialize_starttag(tag, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        if self.cell and self.in_table and not self.done:
+            self.add_html(self.serialize_starttag(tag, attrs, close=True))
+
+        else:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self.done or not self.in_table: return
+
+        if self.cell and self.nested:
+            if tag == "table":
+                self.nested -= 1
+            self.add_html("</{}>".format(tag))
+            return
+
+        if tag in ["td", "th"]:
+            self.close_cell()
+
+        elif tag == "tr":
+            self.close_row()
+
+        elif tag in ["thead", "tbody", "tfoot"]:
+            self.close_row()
+            self.grid.end_group()
+            self.section = ""
+
+        elif tag == "caption" and self.cell and self.cell.name == "caption":
+            self.caption = HTML(self.cell.inner_html())
+            self.cell = None
+
+        elif tag == "colgroup":
+            self.colgroup = None
+
+        elif tag == "table":
+            self.close_row()
+            self.in_table = False
+            self.done = True
+
+        elif self.cell:
+            self.add_html("</{}>".format(tag))
+
+    def handle_data(self, d):
+        if self.cell:
+            self.add_string(d, d)
+
+    def handle_entityref(self, name):
+        if self.cell:
+            ref = "&{};".format(name)
+            self.add_string(ref, unescape(ref))
+
+    def handle_charref(self, name):
+        if self.cell:
+            ref = "&#{};".format(name)
+            self.add_string(ref, unescape(ref))
+
+    def handle_comment(self, data):
+        if self.cell:
+            self.add_html("<!--{}-->".format(data))
+
+    def close_cell(self):
+        if self.cell and self.cell.name != "caption":
+            self.cell = None
+            self.nested = 0
+        self.in_string = False
+
+    def close_row(self):
+        self.close_cell()
+        tr = self.tr
+        self.tr = None
+        if not tr: return
+
+        # unlike Table.find_layout the width is only as wide as the rows seen so far
+        cells, slots = self.grid.add_row(tr)
+        if self.section == "thead" or self.table.is_header_cols(tr, self.headers):
+            self.table.set_headers(cells, self.headers)
+
+        else:
+            value_class = self.table.value_class
+            create_value = lambda col: value_class(col.inner_html(), keep_images=True)
+            row = self.table.find_values(slots, create_value)
+            self.rows.append(self.table.create_row(row, self.headers, self.grid.width))
+
+    def close(self):
+        HTMLParser.close(self)
+        self.close_row()
+
+
 class Table(Base):
     """Parses a <table> element to make it easier to consume programmatically
 
@@ -153,6 +833,36 @@ class Table(Base):
     def tables(self):
         return self.fields["tables"]
 
+    # matches selectors that only look at the <table> element itself (its class,
+    # id, or attributes, eg "table.wikitable, table[border]"), these still match
+    # when only the tables are parsed into the tree
+    select_regex = re.compile(
+        r"^\s*table(?:[.#][\w-]+|\[[^\]]*\])*\s*(?:,\s*table(?:[.#][\w-]+|\[[^\]]*\])*\s*)*$"
+    )
+
+    def __init__(self, url, body=None, lazy=False, compact=False, only=None, select=None, **kwargs):
+        """
+        :param url: str, see Base
+        :param body: str, see Base
+        :param lazy: bool, True to make the cell values LazyHTML instances that only
+            strip/serialize a cell when its text/html is actually used
+        :param compact: bool, True to make the rows CompactRow instances instead of
+            Row instances
+        :param only: str, "tables" or "dls" to only parse and find those elements,
+            None finds both
+        :param select: str, a css selector, only the tables that match it are found,
+            a selector that only looks at the table itself (eg, "table.wikitable")
+            is the fastest since the rest of the page doesn't have to be parsed,
+            any other selector (eg, "div.results table") parses the whole page
+        :param **kwargs: see Base
+        """
+        super(Table, self).__init__(url, body, **kwargs)
+        self.lazy = lazy
+        self.value_class = LazyHTML if lazy else HTML
+        self.compact = compact
+        self.only = only
+        self.select = select
+
     @property
     def dls(self):
         return self.fields["dls"]
@@ -161,10 +871,221 @@ class Table(Base):
         # http://stackoverflow.com/questions/11790535/extracting-data-from-html-table
         datasets = {"tables": [], "dls": []}
         soup = self.soup
-        datasets["tables"] = self.find_tables(soup)
-        datasets["dls"] = self.find_dls(soup)
+        if self.only != "dls":
+            with self.timer("find_tables"):
+                datasets["tables"] = self.find_tables(soup)
+
+            if self.stats is not None:
+                self.incr("tables", len(datasets["tables"]))
+                self.incr("rows", sum(len(rows) for rows in datasets["tables"]))
+
+        if self.only != "tables":
+            with self.timer("find_dls"):
+                datasets["dls"] = self.find_dls(soup)
+            self.incr("dls", len(datasets["dls"]))
+
         return datasets
 
+    def get_parse_only(self):
+        if self.parse_only is not None:
+            return super(Table, self).get_parse_only()
+
+        if self.select and not self.select_regex.match(self.select):
+            # the selector depends on the ancestors or siblings of the table, which
+            # wouldn't be in the tree
+            return None
+
+        # the rest of the page (scripts, nav, etc) is never looked at so there is
+        # no reason to put it in the tree
+        names = []
+        if self.only != "dls":
+            names.append("table")
+        if self.only != "tables":
+            names.append("dl")
+        return SoupStrainer(names)
+
+    def get_options(self):
+        return {
+            "lazy": self.lazy,
+            "compact": self.compact,
+            "only": self.only,
+            "select": self.select,
+        }
+
+    def jsonable(self, o):
+        if isinstance(o, LazyHTML):
+            return String(o)
+
+        elif isinstance(o, CompactRow):
+            return OrderedDict(o.items())
+
+        return super(Table, self).jsonable(o)
+
+    def stream(self, index=0, chunk_size=65536):
+        """Yield the content rows of one table one at a time without ever parsing
+        the whole document into a tree, the caption of the table is set into
+        .stream_caption
+
+        The html is fed to a TableStream in chunks (if body wasn't passed in then the
+        url is fetched and read as it downloads) and each Row is yielded as soon as
+        its </tr> is seen. The rows have the same keys/headers/colspan/rowspan handling
+        as find_content, the only difference is a row can't be padded to the width of
+        a later, wider row since that row hasn't been seen yet
+
+        :Example:
+            t = Table(url)
+            for row in t.stream():
+                print(row)
+
+        :param index: int, which table of the document, this is the same as the
+            index of the table in .tables
+        :param chunk_size: int, how many characters to feed to the parser at a time
+        :returns: generator of Row instances
+        :raises: IndexError, when the document doesn't have a table at index (like
+            .tables[index] would)
+        """
+        parser = TableStream(self, index)
+        count = 0
+        # the <caption> comes before any rows, so this is set by the time the first
+        # row is yielded
+        self.stream_caption = ""
+        chunks = self.stream_body(chunk_size)
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+                self.stream_caption = parser.caption
+                for row in parser.pop_rows():
+                    count += 1
+                    yield row
+
+                if parser.done:
+                    break
+
+        finally:
+            # closing the body generator closes the streamed response, so a table
+            # that ends early (or a caller that stops early) doesn't leave the
+            # connection checked out of the pool
+            chunks.close()
+
+        parser.close()
+        self.stream_caption = parser.caption
+        for row in parser.pop_rows():
+            count += 1
+            yield row
+
+        self.incr("rows", count)
+        if parser.table_count < index:
+            raise IndexError("{} only has {} tables".format(self.url, parser.table_count + 1))
+
+    def stream_body(self, chunk_size):
+        """yield body in chunk_size pieces, fetching it if needed
+
+        :param chunk_size: int
+        :returns: generator of str
+        """
+        if self.body is None:
+            res = self.fetch(stream=True)
+            try:
+                chunks = res.iter_content(chunk_size)
+                if self.stats is not None:
+                    chunks = self.count_bytes(chunks)
+
+                # requests guesses ISO-8859-1 for any text/* response that doesn't
+                # have a charset, so its encoding is only used when the server
+                # actually sent one
+                encoding = res.encoding if self.get_charset(res) else None
+                for chunk in self.decode_body(chunks, encoding):
+                    yield chunk
+
+            finally:
+                res.close()
+
+        else:
+            body = self.body
+            chunks = (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+            for chunk in self.decode_body(chunks):
+                yield chunk
+
+    def get_charset(self, response):
+        """Return the charset of the Content-Type header of response, None if it
+        doesn't have one"""
+        for k, v in response.headers.items():
+            if k.lower() == "content-type":
+                for param in v.split(";")[1:]:
+                    name, _, value = param.partition("=")
+                    if name.strip().lower() == "charset" and value.strip():
+                        return value.strip().strip("\"'")
+        return None
+
+    def decode_body(self, chunks, encoding=None):
+        """decode the bytes chunks of body into str, str chunks are passed through
+
+        :param chunks: iterable of bytes or str
+        :param encoding: str, the encoding of the bytes, if None the encoding is
+            found from the <meta> charset of the beginning of the body, and falls
+            back to utf-8 (this is what parse() would get from bs4)
+        :returns: generator of str
+        """
+        decoder = None
+        buf = []
+        buf_size = 0
+        for chunk in chunks:
+            if not isinstance(chunk, Bytes):
+                if chunk:
+                    yield chunk
+                continue
+
+            if decoder is None:
+                # the charset declaration should be near the top of the document,
+                # so hold on to chunks until there is enough to look at
+                buf.append(chunk)
+                buf_size += len(chunk)
+                if buf_size < 2048:
+                    continue
+
+                chunk = b"".join(buf)
+                buf = []
+                decoder = self.create_decoder(chunk, encoding)
+
+            chunk = decoder.decode(chunk)
+            if chunk:
+                yield chunk
+
+        if buf:
+            chunk = b"".join(buf)
+            decoder = self.create_decoder(chunk, encoding)
+            chunk = decoder.decode(chunk)
+            if chunk:
+                yield chunk
+
+        if decoder is not None:
+            chunk = decoder.decode(b"", final=True)
+            if chunk:
+                yield chunk
+
+    def create_decoder(self, chunk, encoding=None):
+        """Return an incremental decoder for a body that starts with chunk
+
+        :param chunk: bytes, the beginning of the body
+        :param encoding: str, the known encoding, None to find it from chunk
+        :returns: codecs.IncrementalDecoder
+        """
+        if not encoding:
+            encoding = EncodingDetector.find_declared_encoding(chunk, is_html=True)
+
+        try:
+            decoder = codecs.getincrementaldecoder(encoding or "utf-8")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")
+
+        return decoder(errors="replace")
+
+    def count_bytes(self, chunks):
+        """pass chunks through while adding their size to the bytes count of stats"""
+        for chunk in chunks:
+            self.incr("bytes", len(chunk))
+            yield chunk
+
     def is_header_row(self, tr, headers):
         """decide if this row is a header row or content row
 
@@ -175,6 +1096,16 @@ class Table(Base):
         :param headers: Headers instance
         :returns: boolean, True if this is a header row
         """
+        return self.is_header_cols(tr.find_all(["td", "th"], recursive=False), headers)
+
+    def is_header_cols(self, cols, headers):
+        """The guts of is_header_row, this works on the td and th elements of the row
+        so it can be used for bs4 elements and StreamCell instances
+
+        :param cols: list, the td and th elements of the row
+        :param headers: Headers instance
+        :returns: boolean, True if these columns make up a header row
+        """
         ret = False
 
         all_scope_col = True
@@ -182,7 +1113,7 @@ class Table(Base):
         has_td = False
         has_keys = len(headers.keys) > 0
 
-        for col in tr.find_all(["td", "th"], recursive=False):
+        for col in cols:
             if col.name == "th":
                 has_th = True
                 scope = col.get("scope", "col")
@@ -209,142 +1140,149 @@ class Table(Base):
     def find_dimensions(self, table):
         """Return the col, row of the table
 
-        straigh from the spec how to get column count:
-        https://www.w3.org/TR/html4/struct/tables.html#h-11.2.4.3
+        cols is the width of the table's grid (see find_layout()) and rows is how
+        many rows the tallest row group (thead, tbody, tfoot, or the rows that
+        aren't in a group) has
 
         :param table: BeautifulSoup Element
-        :returns: tuple, (rows, cols) = (int, int)
-        """
-        cols_x = 0
-        rows_y = 0
-
-        # https://developer.mozilla.org/en-US/docs/Web/HTML/Element/colgroup
-        elem = table.find("colgroup", recursive=False)
-        if elem:
-            cols_x = elem.get("span", 1)
-            col_elems = elem.find_all("col")
-            if col_elems:
-                cols_x = 0
-                for col_elem in col_elems:
-                    cols_x += int(col_elem.get("span", 1))
-
-        thead = table.find("thead", recursive=False)
-        if thead:
-            tbody = table.find("tbody", recursive=False)
-            tfoot = table.find("tfoot", recursive=False)
-            for elem in [thead, tbody, tfoot]:
-                if elem:
-                    rows_y = max(len(elem.find_all("tr", recursive=False)), rows_y)
-
-        if not cols_x:
-            if thead:
-                for tr in thead.find_all("tr", recursive=False):
-                    for th in tr.find_all("th", recursive=False):
-                        cols_x += int(th.get("colspan", 1))
-
-                for elem in [tbody, tfoot]:
-                    for tr in thead.find_all("tr", recursive=False):
-                        td_cols_x = 0
-                        for td in tr.find_all("td", recursive=False):
-                            td_cols_x += int(td.get("colspan", 1))
-                    cols_x = max(cols_x, td_cols_x)
+        :returns: tuple, (cols, rows) = (int, int)
+        """
+        caption, grid, rows = self.find_layout(table, Headers())
+        heights = defaultdict(int)
+        for section, cells, slots in rows:
+            heights[section] += 1
+        return grid.width, max(heights.values()) if heights else 0
 
-            else:
-                for tr in table.find_all("tr", recursive=False):
-                    td_cols_x = 0
-                    for name in ["td", "th"]:
-                        for td in tr.find_all(name, recursive=False):
-                            td_cols_x += int(td.get("colspan", 1))
-                        cols_x = max(cols_x, td_cols_x)
+    def find_cells(self, tr):
+        """Return the td and th elements of the tr element"""
+        return [c for c in tr.children if c.name == "td" or c.name == "th"]
 
-        if not rows_y:
-            rows_y = len(table.find_all("tr", recursive=False))
+    def find_layout(self, table, headers):
+        """Walk the table element once, placing every row in a Grid as it is found
 
-        return int(cols_x), int(rows_y)
+        the thead, tbody, and tfoot row groups (and rows that aren't in a group) are
+        used in the order they appear except tfoot rows always come last
 
-    def find_table(self, table):
-        """parse the passed in table element
+        https://developer.mozilla.org/en-US/docs/Web/HTML/Element/tfoot
 
         :param table: bs4 element, the table
-        :returns: dict with 2 keys: caption and rows
+        :param headers: Header instance, the colgroup information is added to it
+        :returns: tuple, (caption, grid, rows) where rows is a list of
+            (section, cells, slots) tuples, section is the name of the row group
+            ("" if the row isn't in one) and cells, slots are what Grid.add_row
+            returned for the row
         """
-        d = {
-            "caption": "",
-            "rows": [],
-        }
-        headers = Headers()
+        caption = ""
+        grid = Grid()
+        rows = []
+        foot = []
+        colgroup_offset = 0
 
         for c in table.children:
-            if c.name == "caption":
-                d["caption"] = HTML(Soup.inner_html(c))
-
-            elif c.name == "colgroup":
+            name = c.name
+            if name == "tr":
+                rows.append(("",) + grid.add_row(self.find_cells(c)))
+
+            elif name == "thead" or name == "tbody" or name == "tfoot":
+                grid.end_group()
+                section = foot if name == "tfoot" else rows
+                for tr in c.children:
+                    if tr.name == "tr":
+                        section.append((name,) + grid.add_row(self.find_cells(tr)))
+                grid.end_group()
+
+            elif name == "caption":
+                caption = HTML.from_element(c)
+
+            elif name == "colgroup":
                 # https://developer.mozilla.org/en-US/docs/Web/HTML/Element/colgroup
-                self.find_colgroup(c, headers)
+                colgroup_offset = self.find_colgroup(c, headers, colgroup_offset)
+                grid.add_columns(colgroup_offset)
 
-            elif c.name == "thead":
-                # https://developer.mozilla.org/en-US/docs/Web/HTML/Element/thead
-                for tr in c.find_all("tr", recursive=False):
-                    self.find_headers(tr, headers)
+        rows.extend(foot)
+        return caption, grid, rows
 
-        d["rows"] = self.find_content(table, headers)
-        return Rows(**d)
+    def find_table(self, table):
+        """parse the passed in table element
 
-        #pout.v(headers, d)
+        :param table: bs4 element, the table
+        :returns: Rows
+        """
+        headers = Headers()
+        caption, grid, rows = self.find_layout(table, headers)
+        return Rows(caption, self.find_content(rows, headers, grid.width))
 
-    def find_content(self, table, headers):
-        """Find all the content rows of the table
+    def find_content(self, rows, headers, cols_x=0):
+        """Find all the content rows of the table, the header rows update headers as
+        they are found so each content row gets the headers that came before it
 
-        :param table: bs4 element, the table
+        :param rows: list, the rows returned from find_layout()
         :param headers: Header instance, used to track keys/headers of each column
+        :param cols_x: int, the width of the table, every row is padded to this
         :returns: list, a list of the content rows of the table
         """
-        rows = []
-        cols_x, rows_y = self.find_dimensions(table)
+        ret = []
+        value_class = self.value_class
+        create_value = lambda col: value_class.from_element(col, keep_images=True)
+
+        for section, cells, slots in rows:
+            if section == "thead" or self.is_header_cols([cell.element for cell in cells], headers):
+                # https://developer.mozilla.org/en-US/docs/Web/HTML/Element/thead
+                self.set_headers(cells, headers)
 
-        tbody = table.find("tbody", recursive=False)
-        if not tbody: tbody = table
-        elems = [tbody]
+            else:
+                ret.append(self.create_row(self.find_values(slots, create_value), headers, cols_x))
 
-        # https://developer.mozilla.org/en-US/docs/Web/HTML/Element/tfoot
-        tfoot = table.find("tfoot", recursive=False)
-        if tfoot:
-            elems.append(tfoot)
+        return ret
 
-        for elem in elems:
-            for tr in elem.find_all("tr", recursive=False):
-                if self.is_header_row(tr, headers):
-                    self.find_headers(tr, headers)
+    def find_values(self, slots, create_value):
+        """Return the value of each column of a content row
 
-                else:
-                    row = []
-                    for col in tr.find_all(["td", "th"], recursive=False):
-                        text = HTML(Soup.inner_html(col), keep_images=True)
-                        row.append(text)
-                        colspan = int(col.get("colspan", 1))
-                        if colspan > 1:
-                            row.extend([None] * (colspan - 1))
+        a cell that spans columns only has a value in its first column (the rest are
+        None), a cell that spans rows has the same value in each row it spans
 
-                        # TODO: We don't take rowpsan into account at all
+        :param slots: list, the slots of the row returned from Grid.add_row()
+        :param create_value: callable, called with a cell's element to create its
+            value, this is only called once for each cell
+        :returns: list
+        """
+        row = []
+        for x, cell in enumerate(slots):
+            if cell is None or cell.x != x:
+                row.append(None)
 
-                    if len(row) < cols_x:
-                        row.extend([None] * (cols_x - len(row)))
+            else:
+                if cell.value is None:
+                    cell.value = create_value(cell.element)
+                row.append(cell.value)
 
-                    d = Row()
-                    #pout.v(headers)
-                    for i, v in enumerate(row):
-                        #pout.v(i, v)
-                        k = headers.get_key(i)
-                        hs = headers.get_headers(i)
-                        d[k] = {
-                            "headers": hs,
-                            "value": v,
-                        }
+        return row
 
-                    rows.append(d)
+    def create_row(self, row, headers, cols_x=0):
+        """Create a Row from the values of a content row
 
-        return rows
+        :param row: list, the value of each column, see find_values()
+        :param headers: Header instance, used to get the keys/headers of each column
+        :param cols_x: int, the row will be padded with None values to this width
+        :returns: Row or CompactRow
+        """
+        if len(row) < cols_x:
+            row.extend([None] * (cols_x - len(row)))
 
+        schema = headers.get_schema(len(row))
+        if self.compact:
+            return CompactRow(schema, tuple(row))
+
+        d = Row()
+        d.schema = schema
+        for k, hs, i in schema.columns:
+            # every row gets its own headers list, the schema's are shared
+            d[k] = {
+                "headers": list(hs),
+                "value": row[i],
+            }
+
+        return d
 
     def find_headers(self, tr, headers):
         """Return the found headers of the tr element
@@ -355,50 +1293,57 @@ class Table(Base):
         :param headers: Header instance, used to track keys/headers of each column, this
             instance is updated without this method returning anything
         """
-        offset = 0
-        for th in tr.find_all(["th", "td"], recursive=False):
+        cells, slots = Grid().add_row(self.find_cells(tr))
+        self.set_headers(cells, headers)
+
+    def set_headers(self, cells, headers):
+        """The guts of find_headers, this works on the placed th and td elements of
+        the row so it can be used for bs4 elements and StreamCell instances
+
+        :param cells: list, the GridCell instances of the header row
+        :param headers: Header instance, this is updated with the found keys/headers
+        """
+        for cell in cells:
+            th = cell.element
             name = " ".join(th.get("class", []))
-            span = int(th.get("colspan", 1))
             text = th.get_text(strip=True)
-            if span == 1:
+            if cell.colspan == 1:
                 # if the th is for one column then it is a key
-                headers.set_key(name, offset, text)
+                headers.set_key(name, cell.x, text)
 
             else:
-                headers.set_header(name, offset, span, text)
+                headers.set_header(name, cell.x, cell.colspan, text)
 
-            offset += span
-
-
-    def find_colgroup(self, colgroup, headers):
+    def find_colgroup(self, colgroup, headers, offset=0):
         """find the column group of this table
 
         https://developer.mozilla.org/en-US/docs/Web/HTML/Element/colgroup
 
         :param colgroup: bd4 element, the <colgroup>
         :param headers: Header instance, used to track keys/headers of each column, this
-            instance is updated without this method returning anything
-        :returns: headers, the headers ref is also updated
+            instance is updated
+        :param offset: int, the column the colgroup starts at, this is the end of
+            the previous colgroup of the table
+        :returns: int, the column the next colgroup would start at
         """
-        offset = 0
-
         # if the <colgroup> itself has a span then there won't be any <col> tags
-        span = int(colgroup.get("span", 0))
+        span = Grid.get_span(colgroup, "span", 0)
         if span:
-            text = c.get("class", "")
+            text = colgroup.get("class", "")
             if text:
                 headers.add_colgroup(offset, span, text)
+            offset += span
 
         else:
             for c in colgroup.find_all("col", recursive=False):
-                span = int(c.get("span", 1))
+                span = Grid.get_span(c, "span", 1)
                 text = c.get("class", "")
                 if text:
                     headers.add_colgroup(offset, span, text)
 
                 offset += span
 
-        return headers
+        return offset
 
     def find_tables(self, soup):
         """Find all the tables in the given bs4 soup
@@ -407,7 +1352,8 @@ class Table(Base):
         :returns: list, all the found and parsed <table> elements
         """
         ret = []
-        for table in soup.find_all("table"):
+        tables = soup.select(self.select) if self.select else soup.find_all("table")
+        for table in tables:
             r = self.find_table(table)
             ret.append(r)
 
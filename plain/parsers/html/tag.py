@@ -390,15 +390,24 @@ ATTRIBUTES = {
 }
 
 
+# the attributes every tag supports
+GLOBAL_ATTRIBUTES = frozenset(ATTRIBUTES["Global attribute"])
+
+# key = tagname, value = frozenset of every attribute that tag supports (the global
+# attributes are already merged in), this is built once so sanitizing an element
+# is just a lookup and ATTRIBUTES itself is never modified
+SUPPORTED_ATTRIBUTES = {
+    tagname: GLOBAL_ATTRIBUTES.union(attrs) for tagname, attrs in ATTRIBUTES.items()
+}
+
+
 class Attributes(object):
     """Given a beautiful soup element this will remove any elements that aren't 
     supported for that element's tagname"""
     @property
     def supported(self):
-        """Returns a set of all the attributes this element supports"""
-        attrs = ATTRIBUTES.get(self.element.name, [])
-        attrs.extend(ATTRIBUTES["Global attribute"])
-        return set(attrs)
+        """Returns a frozenset of all the attributes this element supports"""
+        return SUPPORTED_ATTRIBUTES.get(self.element.name, GLOBAL_ATTRIBUTES)
 
     def __init__(self, element):
         """create an Attributes instance
@@ -409,9 +418,17 @@ class Attributes(object):
 
     def clean(self):
         """sanitize the element"""
-        supported = self.supported
-        for attr in self.element.attrs.keys():
-            if attr not in supported:
-                del self.element[attr]
+        self.clean_element(self.element)
 
+    @classmethod
+    def clean_element(cls, element):
+        """sanitize element without creating an Attributes instance, this is what
+        tree walks that clean every element should use
 
+        :param element: bs4 element
+        """
+        attrs = element.attrs
+        if attrs:
+            supported = SUPPORTED_ATTRIBUTES.get(element.name, GLOBAL_ATTRIBUTES)
+            for attr in [attr for attr in attrs if attr not in supported]:
+                del attrs[attr]
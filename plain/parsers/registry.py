@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Chooses the parser of a url by its host
+
+site specific parsers (plugins) are registered by host, either as the class or
+as the path to it so the plugin's module is only imported the first time a url of
+that host is parsed:
+
+    from plain.parsers.registry import registry
+
+    registry.register("arstechnica.com", "myplugins.ars:Arstechnica")
+    a = registry.create("https://arstechnica.com/some/article")
+    a.parse()
+
+a registered host also matches all of its subdomains (so the above would also be
+used for www.arstechnica.com), pass subdomains=False to only match the host itself
+
+Installed packages can also register plugins with the "plain.parsers" entry
+point group, the name of the entry point is the host:
+
+    entry_points={
+        "plain.parsers": [
+            "arstechnica.com = myplugins.ars:Arstechnica",
+        ],
+    }
+
+a url whose host doesn't have a plugin uses the default parser (Readability)
+"""
+from __future__ import unicode_literals, division, print_function, absolute_import
+import importlib
+import threading
+
+from ..compat import parse, basestring
+from .html.article import Readability
+
+
+class Registry(object):
+    """Maps hosts to parser classes, finding the parser of a url is a dict lookup
+    of the host and then one lookup for each of its parent domains, so it doesn't
+    matter how many plugins are registered"""
+
+    # the entry point group installed packages can register plugins under
+    entry_point_group = "plain.parsers"
+
+    def __init__(self, default=Readability, entry_point_group=None):
+        """
+        :param default: Base child class, the parser of hosts without a plugin
+        :param entry_point_group: str, the entry point group plugins are loaded
+            from, defaults to the entry_point_group class property, pass in an
+            empty string to not use entry points
+        """
+        self.default = default
+        if entry_point_group is not None:
+            self.entry_point_group = entry_point_group
+
+        # host -> parser class, or the path to it until the plugin is loaded
+        self.hosts = {}
+
+        # domain -> parser class (or path) of the domain and all its subdomains
+        self.domains = {}
+
+        self.lock = threading.RLock()
+        self.entry_points_loaded = False
+
+    def normalize_host(self, host):
+        """lowercase host and strip any port and trailing dot"""
+        host = host.strip().lower()
+        if ":" in host:
+            host = host.split(":", 1)[0]
+        return host.rstrip(".")
+
+    def get_host(self, url):
+        """Return the normalized host of url, url can also be just the host"""
+        if "//" in url:
+            host = parse.urlparse(url).hostname or ""
+
+        else:
+            host = url.split("/", 1)[0]
+
+        return self.normalize_host(host)
+
+    def register(self, host, parser, subdomains=True):
+        """Register the parser of host
+
+        :param host: str, eg "arstechnica.com"
+        :param parser: Base child class or str, the class or the path to it (eg,
+            "myplugins.ars:Arstechnica" or "myplugins.ars.Arstechnica"), a path
+            isn't imported until the plugin is needed
+        :param subdomains: bool, True if the parser is also used for every
+            subdomain of host
+        """
+        host = self.normalize_host(host)
+        with self.lock:
+            if subdomains:
+                self.domains[host] = parser
+
+            else:
+                self.hosts[host] = parser
+
+    def unregister(self, host):
+        host = self.normalize_host(host)
+        with self.lock:
+            self.hosts.pop(host, None)
+            self.domains.pop(host, None)
+
+    def load_entry_points(self):
+        """Register the plugins of the entry_point_group entry point group, this only
+        happens once and the plugins aren't imported until they are needed"""
+        if self.entry_points_loaded: return
+
+        with self.lock:
+            if not self.entry_points_loaded:
+                if self.entry_point_group:
+                    for ep in self.find_entry_points(self.entry_point_group):
+                        # explicit registrations win over installed plugins
+                        host = self.normalize_host(ep.name)
+                        if host not in self.hosts and host not in self.domains:
+                            self.register(host, ep)
+
+                self.entry_points_loaded = True
+
+    def find_entry_points(self, group):
+        """Return the entry points of group of all the installed packages"""
+        try:
+            from importlib.metadata import entry_points
+
+        except ImportError:
+            try:
+                import pkg_resources
+
+            except ImportError:
+                return []
+
+            return list(pkg_resources.iter_entry_points(group))
+
+        eps = entry_points()
+        if hasattr(eps, "select"):
+            return list(eps.select(group=group))
+        return list(eps.get(group, []))
+
+    def load(self, parser):
+        """Return the class of parser
+
+        :param parser: Base child class, path str, or entry point
+        :returns: Base child class
+        """
+        if isinstance(parser, basestring):
+            if ":" in parser:
+                module_name, class_name = parser.split(":", 1)
+
+            else:
+                module_name, class_name = parser.rsplit(".", 1)
+
+            module = importlib.import_module(module_name)
+            return getattr(module, class_name)
+
+        elif hasattr(parser, "load") and not isinstance(parser, type):
+            return parser.load()
+
+        return parser
+
+    def resolve(self, mapping, key):
+        """Return the loaded parser class of key in mapping, the loaded class
+        replaces the path so the plugin is only imported once"""
+        parser = mapping[key]
+        if isinstance(parser, type):
+            return parser
+
+        parser_class = self.load(parser)
+        with self.lock:
+            if mapping.get(key, None) is parser:
+                mapping[key] = parser_class
+        return parser_class
+
+    def find(self, url):
+        """Return the plugin of url's host
+
+        :param url: str, the url (or just the host)
+        :returns: Base child class or None if the host doesn't have a plugin
+        """
+        self.load_entry_points()
+        host = self.get_host(url)
+        if host in self.hosts:
+            return self.resolve(self.hosts, host)
+
+        # www.news.example.com checks www.news.example.com, news.example.com,
+        # example.com, and com
+        domain = host
+        while domain:
+            if domain in self.domains:
+                return self.resolve(self.domains, domain)
+            domain = domain.partition(".")[2]
+
+        return None
+
+    def get_parser_class(self, url):
+        """Return the parser class that should be used for url, this is the plugin
+        of url's host or the default parser"""
+        return self.find(url) or self.default
+
+    def create(self, url, body=None, **kwargs):
+        """Return an instance of the parser of url
+
+        :param url: str
+        :param body: str, see Base
+        :param **kwargs: passed through to the parser's constructor
+        :returns: Base child instance
+        """
+        return self.get_parser_class(url)(url, body, **kwargs)
+
+
+# the registry plain uses
+registry = Registry()
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, division, print_function, absolute_import
+import os
+import importlib
+from collections import OrderedDict
+
 import bs4
 #from bs4 import BeautifulSoup, Tag
 import requests
@@ -27,21 +31,71 @@ class Soup(bs4.BeautifulSoup):
     # https://www.crummy.com/software/BeautifulSoup/
     # docs: https://www.crummy.com/software/BeautifulSoup/bs4/doc/
     # bs4 codebase: http://bazaar.launchpad.net/~leonardr/beautifulsoup/bs4/files
-    def __init__(self, markup="", features=None, *args, **kwargs):
-        # https://www.crummy.com/software/BeautifulSoup/bs4/doc/#parser-installation
-        if not features:
-            features = "html.parser"
-            try:
-                import lxml
-                features = "lxml"
 
-            except ImportError:
+    # the parser backends in the order they are preferred, the key is the bs4
+    # features name and the value is the module that has to be importable
+    BACKENDS = OrderedDict([
+        ("lxml", "lxml"),
+        ("html5lib", "html5lib"),
+        ("html.parser", None),
+    ])
+
+    # the backend used when features isn't passed in, this is resolved the first
+    # time a Soup is created, set it with set_features() or the
+    # PLAIN_SOUP_FEATURES environment variable to pin a backend process wide
+    default_features = None
+
+    @classmethod
+    def find_features(cls):
+        """Return all the backends that can be used in this environment, in the order
+        they are preferred
+
+        :returns: list
+        """
+        ret = []
+        for features, module_name in cls.BACKENDS.items():
+            if module_name:
                 try:
-                    import html5lib
-                    features = "html5lib"
+                    importlib.import_module(module_name)
 
                 except ImportError:
-                    pass
+                    continue
+
+            ret.append(features)
+        return ret
+
+    @classmethod
+    def get_features(cls):
+        """Return the backend that is used when features isn't passed to the
+        constructor, this is only figured out once
+
+        :returns: str
+        """
+        if not cls.default_features:
+            features = os.environ.get("PLAIN_SOUP_FEATURES", "")
+            if not features:
+                features = cls.find_features()[0]
+            Soup.default_features = features
+        return cls.default_features
+
+    @classmethod
+    def set_features(cls, features):
+        """Set the backend that will be used when features isn't passed to the
+        constructor
+
+        :param features: str, the bs4 features name (eg, "lxml"), None to go back to
+            picking the best installed backend
+        """
+        Soup.default_features = features
+
+    def __init__(self, markup="", features=None, *args, **kwargs):
+        # https://www.crummy.com/software/BeautifulSoup/bs4/doc/#parser-installation
+        if not features:
+            features = self.get_features()
+
+        if features == "html5lib":
+            # html5lib can't parse part of a document so don't make bs4 warn about it
+            kwargs.pop("parse_only", None)
 
         super(Soup, self).__init__(markup, features, *args, **kwargs)
 
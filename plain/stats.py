@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, division, print_function, absolute_import
+import time
+import threading
+from collections import OrderedDict
+
+
+class NullTimer(object):
+    """The timer a parser uses when it has no stats, it does nothing so timing a
+    stage costs one method call when stats aren't wanted"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Timer(object):
+    """Times the wrapped block and adds the time to stats under name"""
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.add_timing(self.name, time.time() - self.start)
+        return False
+
+
+class Stats(object):
+    """Collects how long each stage of a parser took and counts of what it saw, pass
+    an instance into a parser to turn it on
+
+    timings (seconds) and counts are added up, so one Stats can be shared by a batch
+    of parsers (eg, passed to parse_many) to get the totals of the batch. The stages
+    that are timed are fetch, soup (building the tree), simplify and the steps
+    of simplify (eg, find_tables, simplify_tree), the counts are bytes (downloaded),
+    elements (in the tree), tables, rows, and dls
+
+    To send the values somewhere else (a metrics client, a log) as they happen,
+    extend this class and override add_timing() and incr()
+
+    :Example:
+        stats = Stats()
+        t = Table(url, stats=stats)
+        t.parse()
+        print(stats.timings["fetch"], stats.counts["bytes"])
+    """
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.counts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # the lock can't be pickled, this lets parsers with stats be sent to other
+        # processes (eg, simplify_many), those copies won't add to this instance
+        state = dict(self.__dict__)
+        state.pop("lock", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        """Return a context manager that times its block as stage name"""
+        return Timer(self, name)
+
+    def add_timing(self, name, seconds):
+        with self.lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def as_dict(self):
+        """returns a json friendly dict of the timings and counts"""
+        with self.lock:
+            return {
+                "timings": OrderedDict(self.timings),
+                "counts": OrderedDict(self.counts),
+            }
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.as_dict())
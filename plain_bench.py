@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmarks for plain, everything runs offline against the testdata files
+
+    # run everything
+    $ python plain_bench.py
+
+    # just some of the benchmarks
+    $ python plain_bench.py soup table
+
+    # bigger synthetic tables, save the results and compare them to a previous run
+    $ python plain_bench.py scaled --rows 10000 100000 --json new.json --compare old.json
+
+Every result has the best time of one run (seconds), the ops/sec that time works
+out to, and the peak memory (bytes) allocated during one run
+"""
+from __future__ import unicode_literals, division, print_function, absolute_import
+import argparse
+import codecs
+import glob
+import json
+import os
+import platform
+import re
+import sys
+import timeit
+import tracemalloc
+
+import plain
+from plain import Table, Url, Readability
+from plain.soup import Soup
+from plain.parsers.html import Article, Attributes
+from plain.parsers.html.html import HTMLCleaner
+
+
+BASEPATH = os.path.abspath(os.path.expanduser(os.path.dirname(__file__)))
+
+
+def get_corpus():
+    """return a list of (name, html) tuples of every file in testdata/html"""
+    ret = []
+    for path in sorted(glob.glob(os.path.join(BASEPATH, "testdata", "html", "*.html"))):
+        with codecs.open(path, encoding='utf-8', mode='r') as f:
+            ret.append((os.path.basename(path)[:-5], f.read()))
+    return ret
+
+
+def get_articles():
+    """return a list of (name, fields) tuples of every file in testdata/json, these
+    are what Mercury returned so they can be passed to Article as the body"""
+    ret = []
+    for path in sorted(glob.glob(os.path.join(BASEPATH, "testdata", "json", "*.json"))):
+        with codecs.open(path, encoding='utf-8', mode='r') as f:
+            ret.append((os.path.basename(path)[:-5], json.load(f)))
+    return ret
+
+
+def get_scaled_table(rows):
+    """return html of one table that is rows rows long, the rows are copies of the
+    content rows of the first table in tables7.html so the cells look real
+
+    :param rows: int
+    :returns: str
+    """
+    with codecs.open(os.path.join(BASEPATH, "testdata", "html", "tables7.html"), encoding='utf-8') as f:
+        html = f.read()
+
+    table = re.search(r"<table.*?</table>", html, flags=re.S | re.I).group(0)
+    trs = re.findall(r"<tr.*?</tr>", table, flags=re.S | re.I)
+    header, content = trs[0], trs[1:]
+
+    body = [header]
+    for i in range(rows):
+        body.append(content[i % len(content)])
+
+    return "<table>\n{}\n</table>".format("\n".join(body))
+
+
+def measure(callback, number):
+    """run callback number times and return the best time of one run in seconds and
+    the peak memory of a separate run in bytes"""
+    seconds = min(timeit.repeat(callback, repeat=number, number=1))
+
+    tracemalloc.start()
+    try:
+        callback()
+        peak = tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+    return seconds, peak
+
+
+def result(benchmark, name, stage, seconds, peak, ops=1):
+    """create one result record
+
+    :param ops: int, how many operations one run did (eg, how many urls were
+        simplified), ops_per_sec is based on this
+    """
+    return {
+        "benchmark": benchmark,
+        "input": name,
+        "stage": stage,
+        "seconds": seconds,
+        "ops_per_sec": (ops / seconds) if seconds else 0.0,
+        "peak_bytes": peak,
+    }
+
+
+def bench_soup(args):
+    """how long each installed parser backend takes to parse each file"""
+    for features in Soup.find_features():
+        for name, html in args.corpus:
+            seconds, peak = measure(lambda: Soup(html, features), args.number)
+            yield result("soup", name, features, seconds, peak)
+
+
+def bench_table(args):
+    """Table over every file, broken down by stage"""
+    for name, html in args.corpus:
+        t = Table(name, html)
+        seconds, peak = measure(lambda: t.create_soup(), args.number)
+        yield result("table", name, "soup", seconds, peak)
+
+        soup = t.create_soup()
+        seconds, peak = measure(lambda: t.find_tables(soup), args.number)
+        yield result("table", name, "find_tables", seconds, peak)
+
+        seconds, peak = measure(lambda: t.find_dls(soup), args.number)
+        yield result("table", name, "find_dls", seconds, peak)
+
+        seconds, peak = measure(lambda: Table(name, html).parse(), args.number)
+        yield result("table", name, "parse", seconds, peak)
+
+
+def bench_scaled(args):
+    """Table over synthetic tables that are args.rows rows long, this is where
+    per-row costs show up"""
+    for rows in args.rows:
+        html = get_scaled_table(rows)
+        name = "tables7x{}".format(rows)
+        for stage, kwargs in [("parse", {}), ("parse_compact", {"compact": True}), ("parse_lazy", {"lazy": True})]:
+            seconds, peak = measure(lambda: Table(name, html, **kwargs).parse(), args.number)
+            yield result("scaled", name, stage, seconds, peak, rows)
+
+        seconds, peak = measure(lambda: sum(1 for r in Table(name, html).stream()), args.number)
+        yield result("scaled", name, "stream", seconds, peak, rows)
+
+
+def bench_article(args):
+    """Article simplification of the content of every testdata/json file, broken
+    down by stage"""
+    for name, fields in args.articles:
+        a = Article(fields["url"], fields)
+        stages = [
+            ("simplify_document", a.simplify_document),
+            ("simplify_tags", a.simplify_tags),
+            ("simplify_attrs", a.simplify_attrs),
+            ("simplify_tree", a.simplify_tree),
+        ]
+        for stage, method in stages:
+            # every stage modifies the tree so each run needs its own
+            def callback():
+                soup = a.create_soup()
+                method(soup)
+
+            seconds, peak = measure(callback, args.number)
+            soup_seconds, soup_peak = measure(a.create_soup, args.number)
+            yield result("article", name, stage, max(seconds - soup_seconds, 0.0), peak)
+
+        seconds, peak = measure(lambda: Article(fields["url"], fields).simplify(), args.number)
+        yield result("article", name, "simplify", seconds, peak)
+
+
+def bench_readability(args):
+    """Readability extraction of every file that isn't a table test"""
+    for name, html in args.corpus:
+        if name.startswith("tables"): continue
+
+        r = Readability(name, html)
+        seconds, peak = measure(lambda: r.extract(r.create_soup()), args.number)
+        yield result("readability", name, "extract", seconds, peak)
+
+        seconds, peak = measure(lambda: Readability(name, html).parse(), args.number)
+        yield result("readability", name, "parse", seconds, peak)
+
+
+def bench_strip_tags(args):
+    """HTMLCleaner.strip_tags over every file"""
+    for name, html in args.corpus:
+        seconds, peak = measure(lambda: HTMLCleaner.strip_tags(html), args.number)
+        yield result("strip_tags", name, "strip_tags", seconds, peak)
+
+        soup = Soup(html)
+        seconds, peak = measure(lambda: HTMLCleaner.strip_element(soup), args.number)
+        yield result("strip_tags", name, "strip_element", seconds, peak)
+
+
+def bench_attributes(args):
+    """Attributes.clean over every element of every file"""
+    for name, html in args.corpus:
+        tags = Soup(html).find_all(True)
+        attrs = [dict(tag.attrs) for tag in tags]
+
+        def callback():
+            for tag, a in zip(tags, attrs):
+                tag.attrs = dict(a)
+                Attributes(tag).clean()
+
+        seconds, peak = measure(callback, args.number)
+        yield result("attributes", name, "clean", seconds, peak, len(tags))
+
+
+def bench_url(args):
+    """Url.simplify over every link in every file"""
+    for name, html in args.corpus:
+        urls = []
+        for url in re.findall(r"href=\"(https?://[^\"]+)\"", html):
+            # simplify() is strict about query strings, only time the urls it accepts
+            try:
+                Url.simplify(url)
+                urls.append(url)
+
+            except ValueError:
+                pass
+
+        if not urls: continue
+
+        def callback():
+            for url in urls:
+                Url.simplify(url)
+
+        seconds, peak = measure(callback, args.number)
+        yield result("url", name, "simplify", seconds, peak, len(urls))
+
+
+BENCHMARKS = [
+    ("soup", bench_soup),
+    ("table", bench_table),
+    ("scaled", bench_scaled),
+    ("article", bench_article),
+    ("readability", bench_readability),
+    ("strip_tags", bench_strip_tags),
+    ("attributes", bench_attributes),
+    ("url", bench_url),
+]
+
+
+def compare(results, path, threshold):
+    """print every result that is more than threshold slower than it was in the
+    results saved at path
+
+    :returns: int, how many results regressed
+    """
+    with codecs.open(path, encoding="utf-8") as f:
+        previous = json.load(f)
+
+    key = lambda r: (r["benchmark"], r["input"], r["stage"])
+    previous = {key(r): r for r in previous["results"]}
+
+    regressions = 0
+    for r in results:
+        p = previous.get(key(r), None)
+        if p and p["seconds"]:
+            ratio = r["seconds"] / p["seconds"]
+            if ratio > (1.0 + threshold):
+                regressions += 1
+                print("REGRESSION {} {} {}: {:.2f}ms -> {:.2f}ms ({:.0%})".format(
+                    r["benchmark"],
+                    r["input"],
+                    r["stage"],
+                    p["seconds"] * 1000,
+                    r["seconds"] * 1000,
+                    ratio - 1.0,
+                ))
+
+    return regressions
+
+
+def main():
+    names = [name for name, _ in BENCHMARKS]
+    parser = argparse.ArgumentParser(description="Benchmark plain against testdata")
+    parser.add_argument("benchmarks", nargs="*", choices=names + [[]], default=[], help="which benchmarks to run, defaults to all of them")
+    parser.add_argument("--number", "-n", type=int, default=5, help="how many times to run each test, the best time is kept")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000], help="how many rows the scaled tables have")
+    parser.add_argument("--json", dest="json_path", default="", help="save the results to this path")
+    parser.add_argument("--compare", default="", help="compare to the results saved at this path")
+    parser.add_argument("--threshold", type=float, default=0.1, help="how much slower a result has to be to count as a regression")
+    args = parser.parse_args()
+
+    args.corpus = get_corpus()
+    args.articles = get_articles()
+
+    results = []
+    for name, bench in BENCHMARKS:
+        if args.benchmarks and name not in args.benchmarks: continue
+
+        for r in bench(args):
+            results.append(r)
+            print("{:<12} {:<24} {:<18} {:>10.2f}ms {:>12.1f} ops/s {:>10.1f}KB".format(
+                r["benchmark"],
+                r["input"],
+                r["stage"],
+                r["seconds"] * 1000,
+                r["ops_per_sec"],
+                r["peak_bytes"] / 1024,
+            ))
+            sys.stdout.flush()
+
+    if args.json_path:
+        with codecs.open(args.json_path, encoding="utf-8", mode="w") as f:
+            json.dump({
+                "version": plain.__version__,
+                "python": platform.python_version(),
+                "soup_features": Soup.get_features(),
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare:
+        if compare(results, args.compare, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,21 @@ from collections import defaultdict
 import logging
 import sys
 import json
+import pickle
 
 import testdata
 
-from plain import Article, Table, Url
+from plain import Article, Table, Url, Readability
+from plain.cache import ResponseCache, MemoryCache, SqliteCache
+from plain.stats import Stats
+from plain.parsers.base import Response
+from plain.parsers.registry import Registry
 from plain.parsers.html.article import Mercury
-from plain.parsers.html import HTML
+from plain.parsers.html import HTML, LazyHTML, Attributes
+from plain.parsers.html.table import Rows
+from plain.parsers.html.tag import ATTRIBUTES
 from plain.soup import Soup
+from plain.compat import String
 #from plain.parsers.html.table import Headers
 
 
@@ -146,6 +154,183 @@ class MercuryParserTest(TestCase):
 #         pout.v(path)
 
 
+class ArticleTest(TestCase):
+    def test_simplify_tags(self):
+        html = "".join([
+            "<p><span>foo <span>bar</span></span>",
+            "<script>alert(1)</script>",
+            "<aside><span>che</span></aside> baz</p>",
+        ])
+        soup = Soup(html)
+        a = Article(testdata.get_url())
+        a.simplify_tags(soup)
+        self.assertEqual("<p>foo bar baz</p>", str(soup))
+
+    def test_simplify_tags_subclass(self):
+        class KeepScript(Article):
+            remove_tags = set(["aside"])
+            unwrap_tags = set(["b"])
+
+        soup = Soup("<p><b>foo</b><script>bar</script><aside>che</aside></p>")
+        KeepScript(testdata.get_url()).simplify_tags(soup)
+        self.assertEqual("<p>foo<script>bar</script></p>", str(soup))
+
+
+    def test_simplify_tree(self):
+        html = "".join([
+            "<p class=\"foo\" title=\"bar\"><span id=\"che\">foo</span></p>",
+            "<p style=\"baz\"><a href=\"/\" onclick=\"1\">bar</a><script>alert(1)</script></p>",
+        ])
+        a = Article(testdata.get_url())
+
+        soup = Soup(html)
+        a.simplify_tree(soup)
+        expected = "<p title=\"bar\">foo</p><p><a href=\"/\">bar</a></p>"
+        self.assertEqual(expected, str(soup))
+
+        soup = Soup(html)
+        a.simplify_attrs(a.simplify_tags(soup))
+        self.assertEqual(expected, str(soup))
+
+    def test_simplify_hooks(self):
+        """child classes that override simplify_tags or simplify_attrs still have
+        them called when the content is simplified"""
+        calls = []
+        class Tags(Article):
+            def simplify_tags(self, element):
+                calls.append("tags")
+                return super(Tags, self).simplify_tags(element)
+
+        class Attrs(Article):
+            def simplify_attrs(self, element):
+                calls.append("attrs")
+                for tag in element.find_all(True):
+                    tag.attrs = {}
+
+        body = {"content": "<p title=\"foo\"><span>bar</span><script>che</script></p>"}
+        self.assertEqual(Article(testdata.get_url(), dict(body)).parse()["content"], Tags(testdata.get_url(), dict(body)).parse()["content"])
+        self.assertEqual(["tags"], calls)
+
+        fields = Attrs(testdata.get_url(), dict(body)).parse()
+        self.assertEqual(["tags", "attrs"], calls)
+        self.assertFalse("title" in fields["content"])
+        self.assertFalse("script" in fields["content"])
+
+
+class ReadabilityTest(TestCase):
+    def test_mercury(self):
+        """the fields should be close to what Mercury found for the same page"""
+        from plain.parsers.html.html import HTMLCleaner
+        get_words = lambda html: HTMLCleaner.unescape(HTMLCleaner.strip_tags(html)).split()
+
+        for filename in ["bloomberg.com", "businessinsider.com", "newyorker.com"]:
+            expected = self.get_json(filename)
+            r = Readability(testdata.get_url(), self.get_html(filename))
+            fields = r.parse()
+
+            for k in ["title", "excerpt", "lead_image_url", "url", "domain", "direction"]:
+                self.assertEqual(expected[k], fields[k])
+            self.assertTrue(expected["author"].endswith(fields["author"]))
+            self.assertEqual(expected["date_published"][:7], fields["date_published"][:7])
+            self.assertTrue(abs(expected["word_count"] - fields["word_count"]) < expected["word_count"] * 0.2)
+
+            expected_words = get_words(expected["content"])
+            words = get_words(fields["content"])
+            self.assertEqual(expected_words[:10], words[:10])
+            self.assertEqual(expected_words[-10:], words[-10:])
+
+    def test_simplify_twice(self):
+        html = self.get_html("newyorker.com")
+        a = Readability("https://www.newyorker.com/x", html)
+        fields = dict(a.parse())
+        a.simplify()
+        self.assertEqual(fields, a.fields)
+        self.assertTrue(a.soup.find("html") is not None)
+
+    def test_result_cache_url(self):
+        html = "<html><body><article><p>{}</p><img src=\"/foo.jpg\"></article></body></html>".format("foo bar, che. " * 20)
+        cache = MemoryCache()
+        a1 = Readability("http://one.com/x", html, result_cache=cache)
+        a2 = Readability("http://two.com/x", html, result_cache=cache)
+        f1 = a1.parse()
+        f2 = a2.parse()
+        self.assertEqual("one.com", f1["domain"])
+        self.assertEqual("two.com", f2["domain"])
+        self.assertEqual("http://two.com/x", f2["url"])
+        self.assertEqual("http://two.com/foo.jpg", f2["lead_image_url"])
+
+    def test_fallbacks(self):
+        html = "".join([
+            "<html><head><title>The title of the article - Example Site</title></head>",
+            "<body>",
+            "<div class=\"sidebar\"><p>Lots of sidebar text that isn't part of the article, more text, more text</p></div>",
+            "<div class=\"article-body\">",
+            "<p class=\"byline\">by <a rel=\"author\" href=\"/alice\">Alice</a></p>",
+            "<p>The first paragraph, it has enough text to count, and a couple of commas.</p>",
+            "<p>The second paragraph, it also has enough text to count as a paragraph.</p>",
+            "<img src=\"/lead.jpg\">",
+            "</div>",
+            "</body></html>",
+        ])
+        fields = Readability("http://example.com/article", html).parse()
+        self.assertEqual("The title of the article", fields["title"])
+        self.assertEqual("Alice", fields["author"])
+        self.assertEqual("http://example.com/lead.jpg", fields["lead_image_url"])
+        self.assertEqual("example.com", fields["domain"])
+        self.assertTrue(fields["excerpt"].startswith("by Alice The first paragraph"))
+        self.assertFalse("sidebar" in fields["content"])
+        self.assertTrue("second paragraph" in fields["content"])
+
+
+class RegistryTest(TestCase):
+    def test_find(self):
+        class Ars(Readability): pass
+        class News(Readability): pass
+
+        r = Registry(entry_point_group="")
+        r.register("arstechnica.com", Ars)
+        r.register("news.example.com", News, subdomains=False)
+
+        self.assertEqual(Ars, r.find("https://arstechnica.com/foo"))
+        self.assertEqual(Ars, r.find("http://www.ArsTechnica.com:8080/foo"))
+        self.assertEqual(Ars, r.find("arstechnica.com"))
+        self.assertEqual(News, r.find("http://news.example.com/foo"))
+        self.assertEqual(None, r.find("http://www.news.example.com/foo"))
+        self.assertEqual(None, r.find("http://notarstechnica.com/foo"))
+
+        self.assertEqual(Readability, r.get_parser_class("http://example.com/foo"))
+        self.assertTrue(isinstance(r.create("http://arstechnica.com", "<p>foo</p>"), Ars))
+
+        r.unregister("arstechnica.com")
+        self.assertEqual(None, r.find("https://arstechnica.com/foo"))
+
+    def test_lazy(self):
+        basedir = testdata.create_dir()
+        modname = "plain_registry_{}".format(testdata.get_ascii(8).lower())
+        with codecs.open(os.path.join(basedir, "{}.py".format(modname)), encoding="utf-8", mode="w") as f:
+            f.write("\n".join([
+                "from plain import Readability",
+                "class Ars(Readability): pass",
+            ]))
+        sys.path.insert(0, basedir)
+
+        try:
+            r = Registry(entry_point_group="")
+            r.register("arstechnica.com", "{}:Ars".format(modname))
+            self.assertFalse(modname in sys.modules)
+
+            self.assertEqual(Readability, r.get_parser_class("http://example.com"))
+            self.assertFalse(modname in sys.modules)
+
+            parser_class = r.find("http://www.arstechnica.com/foo")
+            self.assertEqual("Ars", parser_class.__name__)
+            self.assertTrue(modname in sys.modules)
+            self.assertTrue(r.domains["arstechnica.com"] is parser_class)
+
+        finally:
+            sys.path.remove(basedir)
+
+
 class TableTest(TestCase):
     def test_header_error(self):
         #html = self.get_html("tables_wikipedia1")
@@ -164,6 +349,442 @@ class TableTest(TestCase):
             self.assertTrue(r.get("Icon"))
 
 
+    def test_soup_cache(self):
+        t = Table(testdata.get_url(), "<table><tr><td>1</td></tr></table>")
+        soup = t.soup
+        self.assertIs(soup, t.soup)
+
+        t.release_soup()
+        self.assertIsNot(soup, t.soup)
+
+        t.body = "<table><tr><td>2</td></tr></table>"
+        self.assertEqual("2", t.soup.find("td").get_text())
+
+        # simplify() changes the tree in place so it isn't kept afterwards
+        t.parse()
+        self.assertIsNone(t._soup)
+        self.assertEqual("2", t.soup.find("td").get_text())
+
+    def test_stream(self):
+        for filename in ["tables4", "tables6", "tables7"]:
+            html = self.get_html(filename)
+            t = Table(testdata.get_url(), html)
+            t.parse()
+            for i, table in enumerate(t.tables):
+                # the tiny chunk size makes sure tags and entities get split
+                rows = list(Table(testdata.get_url(), html).stream(i, chunk_size=7))
+                self.assertEqual(list(table), rows)
+
+    def test_stream_encoding(self):
+        body = "<html><head><meta charset=\"utf-8\"></head><body><table><tr><th>a</th></tr><tr><td>café – naïve</td></tr></table></body></html>"
+        def callback(handler):
+            # no charset, requests would guess ISO-8859-1
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/html")
+            handler.end_headers()
+            handler.wfile.write(body.encode("utf-8"))
+
+        server = testdata.CallbackServer({"GET": callback})
+        with server:
+            t = Table(server.url("foo.html"))
+            t.parse()
+            self.assertEqual("café – naïve", t.tables[0][0]["a"]["value"])
+
+            rows = list(Table(server.url("foo.html")).stream())
+            self.assertEqual("café – naïve", rows[0]["a"]["value"])
+
+        latin = body.replace("utf-8", "iso-8859-1").encode("iso-8859-1", "replace")
+        rows = list(Table(testdata.get_url(), latin).stream(chunk_size=7))
+        self.assertEqual("café ? naïve", rows[0]["a"]["value"])
+
+    def test_stream_close(self):
+        class Response(object):
+            headers = {}
+            encoding = None
+            closed = False
+            def iter_content(self, chunk_size):
+                yield b"<table><tr><td>1</td></tr></table>"
+                yield b"<p>never read</p>"
+            def close(self):
+                self.closed = True
+
+        res = Response()
+        class StreamTable(Table):
+            def fetch(self, **kwargs):
+                return res
+
+        rows = list(StreamTable(testdata.get_url()).stream())
+        self.assertEqual(1, len(rows))
+        self.assertTrue(res.closed)
+
+    def test_stream_colgroup(self):
+        bodies = [
+            # the <col> tags of a colgroup with a span are ignored
+            "<table><colgroup span=\"2\"><col><col span=\"2\"></colgroup><tr><th>a</th><th>b</th></tr><tr><td>1</td><td>2</td></tr></table>",
+            "<table><colgroup><col><col span=\"2\"></colgroup><tr><th>a</th><th>b</th></tr><tr><td>1</td><td>2</td></tr></table>",
+            # spans that aren't numbers use the default
+            "<table><colgroup span=\"2px\"></colgroup><tr><th>a</th></tr><tr><td>1</td></tr></table>",
+            "<table><colgroup><col span=\"abc\"><col></colgroup><tr><th>a</th></tr><tr><td>1</td></tr></table>",
+        ]
+        for body in bodies:
+            t = Table(testdata.get_url(), body)
+            t.parse()
+            rows = list(Table(testdata.get_url(), body).stream())
+            self.assertEqual(list(t.tables[0]), rows)
+
+        t = Table(testdata.get_url(), bodies[0])
+        t.parse()
+        self.assertEqual(["a", "b"], list(t.tables[0][0].keys()))
+
+    def test_stream_nested(self):
+        html = [
+            "<table>",
+            "    <tr><th>outer</th></tr>",
+            "    <tr><td>",
+            "        <table><tr><td>inner</td></tr></table>",
+            "    </td></tr>",
+            "</table>",
+        ]
+        t = Table(testdata.get_url(), "\n".join(html))
+
+        rows = list(t.stream(0))
+        self.assertEqual(1, len(rows))
+        self.assertEqual("inner", rows[0]["outer"]["value"])
+
+        rows = list(t.stream(1))
+        self.assertEqual("inner", rows[0]["0"]["value"])
+
+    def test_lazy(self):
+        html = self.get_html("tables7")
+        t = Table(testdata.get_url(), html)
+        t.parse()
+
+        lt = Table(testdata.get_url(), html, lazy=True)
+        lt.parse()
+        self.assertEqual(t.fields, lt.fields)
+        self.assertEqual(t.json(), lt.json())
+
+        v = t.tables[0][0]["Emoji"]["value"]
+        lv = lt.tables[0][0]["Emoji"]["value"]
+        self.assertTrue(isinstance(lv, LazyHTML))
+        self.assertEqual(v.html, lv.html)
+        self.assertEqual(v.strip(), lv.strip())
+
+        pv = pickle.loads(pickle.dumps(lv))
+        self.assertTrue(isinstance(pv, HTML))
+        self.assertEqual(lv, pv)
+        self.assertEqual(lv.html, pv.html)
+
+    def test_compact(self):
+        html = self.get_html("tables6")
+        t = Table(testdata.get_url(), html)
+        t.parse()
+
+        ct = Table(testdata.get_url(), html, compact=True)
+        ct.parse()
+        self.assertEqual(t.json(), ct.json())
+
+        for r, cr in zip(t.tables[0], ct.tables[0]):
+            self.assertEqual(r, cr)
+            self.assertEqual(list(r.keys()), list(cr.keys()))
+            self.assertEqual(list(r.columns()), list(cr.columns()))
+            for k in ["1 column 1", "2 column 4", "1 header", "4 subheader"]:
+                self.assertEqual(r.get(k), cr.get(k))
+
+        # the rows between header changes share the same schema
+        rows = ct.tables[0]
+        self.assertIsNot(rows[0].schema, rows[1].schema)
+        self.assertIs(rows[3].schema, rows[4].schema)
+
+    def test_header_index(self):
+        html = self.get_html("tables6")
+        t = Table(testdata.get_url(), html)
+        t.parse()
+        row = t.tables[0][1]
+        self.assertEqual({"2 header": (0, 1, 2, 3)}, {
+            k: v for k, v in row.schema.header_index.items() if k == "2 header"
+        })
+        self.assertEqual(["1. 2", "2. 2", "3. 2", "4. 2"], row["2 subheader"]["value"])
+        with self.assertRaises(KeyError):
+            row["1 header"]
+
+    def test_schema(self):
+        from plain.parsers.html.table import Headers
+        headers = Headers()
+        headers.set_key("foo", 0, "a")
+        headers.set_key("bar", 0, "b")
+        headers.set_key("bar", 1, "c")
+        headers.set_header("foo", 0, 2, "h")
+        self.assertEqual("a", headers.get_key(0))
+        self.assertEqual("c", headers.get_key(1))
+        self.assertEqual("2", headers.get_key(2))
+        self.assertEqual(["h"], headers.get_headers(1))
+        self.assertEqual([], headers.get_headers(2))
+
+        schema = headers.get_schema(3)
+        self.assertTrue(schema is headers.get_schema(3))
+        self.assertEqual(("a", "c", "2"), schema.keys)
+
+        headers.set_key("foo", 2, "d")
+        self.assertEqual(("a", "c", "d"), headers.get_schema(3).keys)
+
+        # every row created while the headers are the same shares the schema, but
+        # each row has its own headers lists
+        html = self.get_html("tables6")
+        for compact in [False, True]:
+            t = Table(testdata.get_url(), html, compact=compact)
+            t.parse()
+            rows = t.tables[0]
+            r1, r2 = [(r1, r2) for r1, r2 in zip(rows, rows[1:]) if r1.schema is r2.schema][0]
+            k = list(r1.keys())[-1]
+            self.assertTrue(isinstance(r1.schema.headers[0], tuple))
+            self.assertEqual(r1[k]["headers"], r2[k]["headers"])
+            hs = list(r2[k]["headers"])
+            r1[k]["headers"].append("foo")
+            self.assertEqual(hs, r2[k]["headers"])
+
+    def test_to_columns(self):
+        html = [
+            "<table>",
+            "    <tr><th>name</th><th>count</th><th>rate</th></tr>",
+            "    <tr><td>foo</td><td>1,000</td><td>1.5</td></tr>",
+            "    <tr><td>bar</td><td>2</td><td></td></tr>",
+            "    <tr><td colspan=\"3\">che</td><td>extra</td></tr>",
+            "</table>",
+        ]
+        for compact in [False, True]:
+            t = Table(testdata.get_url(), "\n".join(html), compact=compact)
+            t.parse()
+            rows = t.tables[0]
+
+            columns = rows.to_columns()
+            self.assertEqual(["name", "count", "rate", "3"], list(columns.keys()))
+            self.assertEqual(["foo", "bar", "che"], columns["name"])
+            self.assertEqual([None, None, "extra"], columns["3"])
+
+            columns = rows.to_columns(infer=True)
+            self.assertEqual([1000, 2, None], columns["count"])
+            self.assertEqual([1.5, None, None], columns["rate"])
+            self.assertEqual(["foo", "bar", "che"], columns["name"])
+
+        rows = Rows("", [])
+        for column, expected in [
+            (["1", "-2", "+3", "1,000", "", None], [1, -2, 3, 1000, None, None]),
+            (["1.5", "-.5", "2", "1,000.25", "1e3", "2.5E-2"], [1.5, -0.5, 2.0, 1000.25, 1000.0, 0.025]),
+            # python converts these but they aren't numbers in a table
+            (["nan", "1"], ["nan", "1"]),
+            (["inf", "-Infinity"], ["inf", "-Infinity"]),
+            (["1_000", "2"], ["1_000", "2"]),
+            (["1_2", "3_4"], ["1_2", "3_4"]),
+            (["1,2", "3"], ["1,2", "3"]),
+            (["", None], ["", None]),
+        ]:
+            self.assertEqual(expected, rows.infer_column(column))
+
+    def test_to_arrays(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+
+        html = [
+            "<table>",
+            "    <tr><th>name</th><th>count</th><th>rate</th></tr>",
+            "    <tr><td>foo</td><td>1</td><td>1.5</td></tr>",
+            "    <tr><td>bar</td><td>2</td><td></td></tr>",
+            "</table>",
+        ]
+        t = Table(testdata.get_url(), "\n".join(html))
+        t.parse()
+        arrays = t.tables[0].to_arrays()
+        self.assertEqual(numpy.int64, arrays["count"].dtype)
+        self.assertEqual(3, arrays["count"].sum())
+        self.assertTrue(numpy.isnan(arrays["rate"][1]))
+        self.assertEqual(["foo", "bar"], list(arrays["name"]))
+
+    def test_json(self):
+        from plain.parsers import base
+        orjson = base.orjson
+        try:
+            base.orjson = None
+            self.assertJson()
+
+        finally:
+            base.orjson = orjson
+
+        if orjson:
+            self.assertJson()
+
+    def assertJson(self):
+        from plain.compat import StringIO
+        import io
+
+        html = self.get_html("tables6")
+        for kwargs in [{}, {"lazy": True}, {"compact": True}]:
+            t = Table(testdata.get_url(), html, **kwargs)
+            t.parse()
+            pretty = t.json()
+            compact = t.json(compact=True)
+            self.assertLess(len(compact), len(pretty))
+            self.assertEqual(json.loads(pretty), json.loads(compact))
+
+            for c in [True, False]:
+                fp = StringIO()
+                t.dump(fp, compact=c)
+                self.assertEqual(json.loads(pretty), json.loads(fp.getvalue()))
+
+                fp = io.BytesIO()
+                t.dump(fp, compact=c)
+                self.assertEqual(json.loads(pretty), json.loads(fp.getvalue().decode("utf-8")))
+
+    def test_parse_only(self):
+        html = self.get_html("tables") + self.get_html("tables4")
+        t = Table(testdata.get_url(), html)
+        self.assertIsNone(t.soup.find("script"))
+        self.assertIsNotNone(t.soup.find("table"))
+        self.assertIsNotNone(t.soup.find("dl"))
+
+        t = Table(testdata.get_url(), html, only="dls")
+        t.parse()
+        self.assertEqual(0, len(t.tables))
+        self.assertEqual(4, len(t.dls))
+        self.assertIsNone(t.soup.find("table"))
+
+        t = Table(testdata.get_url(), html, only="tables")
+        t.parse()
+        self.assertEqual(7, len(t.tables))
+        self.assertEqual(0, len(t.dls))
+
+        html = self.get_html("tables6") + self.get_html("tables4")
+        t = Table(testdata.get_url(), html, select="table[border]")
+        t.parse()
+        self.assertEqual(1, len(t.tables))
+        self.assertEqual("This is the table title", t.tables[0].caption)
+        self.assertIsNotNone(t.get_parse_only())
+
+        # selectors that need the rest of the page parse everything
+        html = "\n".join([
+            "<div class=\"results\"><table><tr><td>foo</td></tr></table></div>",
+            "<div id=\"main\"><table><tr><td>bar</td></tr></table></div>",
+        ])
+        for select, value in [("div.results table", "foo"), ("#main > table", "bar"), ("div:nth-of-type(2) table", "bar")]:
+            t = Table(testdata.get_url(), html, select=select)
+            self.assertIsNone(t.get_parse_only())
+            t.parse()
+            self.assertEqual(1, len(t.tables))
+            self.assertEqual(value, t.tables[0][0]["0"]["value"])
+
+    def test_parse_many(self):
+        server = testdata.create_fileserver({
+            "foo.html": "<table><tr><td>foo</td></tr></table>",
+            "bar.html": "<table><tr><td>bar</td></tr></table>",
+        })
+        with server:
+            urls = [server.url("foo.html"), server.url("nope.html"), server.url("bar.html")]
+            ts = list(Table.parse_many(urls, workers=2))
+
+        self.assertEqual(urls, [t.url for t in ts])
+        self.assertEqual("foo", ts[0].tables[0][0]["0"]["value"])
+        self.assertTrue(isinstance(ts[1].error, IOError))
+        self.assertEqual("bar", ts[2].tables[0][0]["0"]["value"])
+
+    def test_parse_many_window(self):
+        fetched = []
+        class FetchTable(Table):
+            def fetch(self, **kwargs):
+                fetched.append(self.url)
+                return Response(self.url, 200, b"<table><tr><td>1</td></tr></table>")
+
+        drawn = []
+        def urls():
+            for i in range(100):
+                drawn.append(i)
+                yield "http://example.com/{}".format(i)
+
+        for ordered in [True, False]:
+            fetched[:] = []
+            drawn[:] = []
+            ts = FetchTable.parse_many(urls(), workers=2, ordered=ordered)
+            t = next(ts)
+            self.assertIsNone(t._soup)
+            self.assertEqual("1", t.tables[0][0]["0"]["value"])
+            # only a window (workers * 2) of urls is in flight, plus the ones that
+            # finished and are waiting to be yielded
+            self.assertLessEqual(len(drawn), 8)
+
+            # the urls that haven't started are cancelled when the caller stops
+            ts.close()
+            self.assertLessEqual(len(fetched), 8)
+            self.assertLessEqual(len(drawn), 8)
+
+    def test_stats(self):
+        body = "<table><tr><th>a</th></tr><tr><td>1</td></tr><tr><td>2</td></tr></table>"
+        server = testdata.create_fileserver({"foo.html": body})
+        stats = Stats()
+        with server:
+            t = Table(server.url("foo.html"), stats=stats)
+            t.parse()
+
+        for name in ["fetch", "soup", "simplify", "find_tables", "find_dls"]:
+            self.assertTrue(name in stats.timings)
+        self.assertEqual(len(body), stats.counts["bytes"])
+        self.assertEqual(1, stats.counts["tables"])
+        self.assertEqual(2, stats.counts["rows"])
+        self.assertEqual(0, stats.counts["dls"])
+        self.assertEqual(7, stats.counts["elements"])
+
+        # stats are added up when they are shared
+        Table(testdata.get_url(), body, stats=stats).parse()
+        self.assertEqual(4, stats.counts["rows"])
+
+        stats = Stats()
+        rows = list(Table(testdata.get_url(), body, stats=stats).stream())
+        self.assertEqual(2, stats.counts["rows"])
+
+        t = Table(testdata.get_url(), body)
+        t.parse()
+        self.assertEqual(None, t.stats)
+
+    def test_aparse(self):
+        try:
+            import asyncio
+            import aiohttp
+        except ImportError:
+            self.skipTest("aiohttp is not installed")
+
+        server = testdata.create_fileserver({
+            "foo.html": "<table><tr><td>foo</td></tr></table>",
+            "bar.html": "<table><tr><td>bar</td></tr></table>",
+        })
+        with server:
+            t = Table(server.url("foo.html"))
+            fields = asyncio.run(t.aparse())
+            self.assertEqual("foo", fields["tables"][0][0]["0"]["value"])
+
+            urls = [server.url("foo.html"), server.url("nope.html"), server.url("bar.html")]
+            ts = asyncio.run(Table.aparse_many(urls, limit=2))
+
+        self.assertEqual(urls, [t.url for t in ts])
+        self.assertEqual("foo", ts[0].tables[0][0]["0"]["value"])
+        self.assertTrue(isinstance(ts[1].error, IOError))
+        self.assertEqual("bar", ts[2].tables[0][0]["0"]["value"])
+
+    def test_simplify_many(self):
+        bodies = [(testdata.get_url(), self.get_html(f)) for f in ["tables4", "tables6"]]
+        bodies.append((testdata.get_url(), None))
+
+        ts = list(Table.simplify_many(bodies, processes=2))
+        for i in range(2):
+            t = Table(*bodies[i])
+            t.parse()
+            self.assertEqual(t.fields, ts[i].fields)
+            self.assertEqual(
+                [r.caption for r in t.tables],
+                [r.caption for r in ts[i].tables]
+            )
+
+        self.assertIsNotNone(ts[2].error)
+
     def test_dimensions(self):
         html = self.get_html("tables4")
         t = Table(testdata.get_url(), html)
@@ -188,6 +809,43 @@ class TableTest(TestCase):
         cols, rows = t.find_dimensions(t.soup.find_all("table")[1])
         self.assertEqual((3, 55), (cols, rows))
 
+    def test_rowspan(self):
+        html = "".join([
+            "<table>",
+            "<thead>",
+            "<tr><th rowspan=\"2\">Region</th><th colspan=\"2\">Revenue</th></tr>",
+            "<tr><th>2019</th><th>2020</th></tr>",
+            "</thead>",
+            "<tbody>",
+            "<tr><td rowspan=\"2\">North</td><td>1</td><td>2</td></tr>",
+            "<tr><td>3</td><td>4</td></tr>",
+            "<tr><td>South</td><td colspan=\"2\">5</td></tr>",
+            "</tbody>",
+            "</table>",
+        ])
+
+        t = Table(testdata.get_url(), html)
+        self.assertEqual((3, 3), t.find_dimensions(t.soup.find("table")))
+
+        for rows in [t.parse()["tables"][0], list(Table(testdata.get_url(), html).stream())]:
+            self.assertEqual(3, len(rows))
+            self.assertEqual(["Region", "2019", "2020"], list(rows[0].keys()))
+            self.assertEqual(["North", "1", "2"], [String(v) for v in rows[0].columns()])
+            self.assertEqual(["North", "3", "4"], [String(v) for v in rows[1].columns()])
+            self.assertEqual(["Revenue"], rows[1]["2020"]["headers"])
+            self.assertEqual(["South", "5", None], [v if v is None else String(v) for v in rows[2].columns()])
+
+        # a rowspan doesn't reach past the end of its row group
+        html = "".join([
+            "<table>",
+            "<tbody><tr><td rowspan=\"0\">a</td><td>b</td></tr><tr><td>c</td></tr></tbody>",
+            "<tbody><tr><td>d</td><td>e</td></tr></tbody>",
+            "</table>",
+        ])
+        rows = Table(testdata.get_url(), html).parse()["tables"][0]
+        self.assertEqual(["a", "c"], [String(v) for v in rows[1].columns()])
+        self.assertEqual(["d", "e"], [String(v) for v in rows[2].columns()])
+
     def test_content(self):
         html = self.get_html("tables4")
         t = Table(testdata.get_url(), html)
@@ -496,6 +1154,200 @@ class UrlTest(TestCase):
         plain_url = Url(original_url)
         self.assertEqual("https://example.com/path/", plain_url)
 
+    def test_hash(self):
+        self.assertEqual(
+            Url("https://example.com/path/?utm_source=source").hash(),
+            Url("https://example.com/path/").hash()
+        )
+
+
+class MainTest(TestCase):
+    def get_server(self):
+        return testdata.create_fileserver({
+            "foo.html": "\n".join([
+                "<table>",
+                "    <caption>foo</caption>",
+                "    <tr><th>a</th><th>b</th></tr>",
+                "    <tr><td>1</td><td>2</td></tr>",
+                "    <tr><td>2</td><td>3</td><td>4</td></tr>",
+                "    <tr><th>c</th><th>d</th></tr>",
+                "    <tr><td>5</td><td>6</td></tr>",
+                "</table>",
+            ]),
+        })
+
+    def main_table(self, *args, **kwargs):
+        from plain.__main__ import main_table
+        from plain.compat import StringIO
+
+        stdout = sys.stdout
+        stderr = sys.stderr
+        sys.stdout = StringIO()
+        sys.stderr = StringIO()
+        try:
+            ret = main_table(*args, **kwargs)
+            return ret, sys.stdout.getvalue(), sys.stderr.getvalue()
+
+        finally:
+            sys.stdout = stdout
+            sys.stderr = stderr
+
+    def test_csv(self):
+        with self.get_server() as server:
+            ret, out, err = self.main_table(server.url("foo.html"), format="csv")
+
+        self.assertFalse(ret)
+        # the header is written again every time the columns change
+        self.assertEqual([
+            "a,b",
+            "1,2",
+            "a,b,2",
+            "2,3,4",
+            "c,d,2",
+            "5,6,",
+        ], out.splitlines())
+
+    def test_json(self):
+        with self.get_server() as server:
+            url = server.url("foo.html")
+            ret, out, err = self.main_table(url, format="json")
+            t = Table(url)
+            t.parse()
+            self.assertEqual(json.loads(t.json()), json.loads(out))
+
+            ret, out, err = self.main_table(url, format="json", table=0)
+            d = json.loads(out)
+            self.assertEqual("foo", d["caption"])
+            # json is streamed like jsonl so a row isn't padded to a later, wider row
+            rows = [json.loads(json.dumps(r)) for r in Table(url).stream()]
+            self.assertEqual(rows, d["rows"])
+
+            ret, out, err = self.main_table(url, format="jsonl")
+            self.assertEqual(3, len(out.splitlines()))
+            self.assertEqual("1", json.loads(out.splitlines()[0])["a"]["value"])
+
+    def test_missing_table(self):
+        with self.get_server() as server:
+            url = server.url("foo.html")
+            for format in ["json", "jsonl", "csv"]:
+                ret, out, err = self.main_table(url, format=format, table=1)
+                self.assertEqual(1, ret)
+                self.assertTrue("1 tables" in err)
+
+
+class ResponseCacheTest(TestCase):
+    def test_conditional(self):
+        server = testdata.create_fileserver({
+            "foo.html": "<table><tr><td>foo</td></tr></table>",
+        })
+        cache = ResponseCache(testdata.create_dir(), ttl=0)
+        with server:
+            url = server.url("foo.html")
+            res = Table(url, cache=cache).fetch()
+            self.assertFalse(getattr(res, "from_cache", False))
+
+            # the ttl has expired so this will revalidate and get a 304
+            t = Table(url, cache=cache)
+            res = t.fetch()
+            self.assertTrue(res.from_cache)
+
+            t.parse()
+            self.assertEqual("foo", t.tables[0][0]["0"]["value"])
+
+        cache.ttl = 60
+        res = Table(url, cache=cache).fetch()
+        self.assertTrue(res.from_cache)
+
+    def test_revalidate(self):
+        etags = ["\"1\"", "\"2\""]
+        def callback(handler):
+            if handler.headers.get("If-None-Match", None):
+                handler.send_response(304)
+                handler.send_header("ETag", etags[1])
+                handler.end_headers()
+
+            else:
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/html")
+                handler.send_header("ETag", etags[0])
+                handler.end_headers()
+                handler.wfile.write(b"<table><tr><td>foo</td></tr></table>")
+
+        cache = ResponseCache(testdata.create_dir(), ttl=0)
+        server = testdata.CallbackServer({"GET": callback})
+        with server:
+            # Url can't simplify this query string but it still has to be cached
+            url = server.url("foo.html?print")
+            Table(url, cache=cache).fetch()
+            meta, body = cache.get(cache.get_key(url))
+            self.assertEqual(etags[0], meta["etag"])
+
+            res = Table(url, cache=cache).fetch()
+            self.assertTrue(res.from_cache)
+            meta, body = cache.get(cache.get_key(url))
+            self.assertEqual(etags[1], meta["etag"])
+            self.assertEqual(b"<table><tr><td>foo</td></tr></table>", body)
+
+        self.assertEqual([], [n for n in os.listdir(cache.directory) if n.endswith(".tmp")])
+
+    def test_evict(self):
+        server = testdata.create_fileserver({
+            "foo.html": "foo" * 10,
+            "bar.html": "bar" * 10,
+        })
+        cache = ResponseCache(testdata.create_dir(), max_size=50, ttl=60)
+        with server:
+            Table(server.url("foo.html"), cache=cache).fetch()
+            self.assertEqual(30, cache.size)
+
+            Table(server.url("bar.html"), cache=cache).fetch()
+            self.assertEqual(30, cache.size)
+
+            meta, body = cache.get(cache.get_key(server.url("foo.html")))
+            self.assertIsNone(meta)
+            meta, body = cache.get(cache.get_key(server.url("bar.html")))
+            self.assertEqual(b"bar" * 10, body)
+
+
+class ResultCacheTest(TestCase):
+    def assertCached(self, cache):
+        html = self.get_html("tables4")
+        t = Table(testdata.get_url(), html, result_cache=cache)
+        t.parse()
+
+        t2 = Table(testdata.get_url(), html, result_cache=cache)
+        t2 = testdata.patch(t2, _simplify=lambda *args, **kwargs: 1 / 0)
+        t2.parse()
+        self.assertEqual(t.fields, t2.fields)
+        self.assertEqual(t.tables[4].caption, t2.tables[4].caption)
+
+    def test_memory(self):
+        self.assertCached(MemoryCache())
+
+    def test_sqlite(self):
+        cache = SqliteCache(os.path.join(testdata.create_dir(), "results.sqlite"))
+        self.assertCached(cache)
+
+    def test_options(self):
+        a = Article(testdata.get_url(), {"content": "<p>foo</p>"})
+        key = a.get_cache_key()
+
+        class KeepScript(Article):
+            remove_tags = set(["aside"])
+
+        a2 = KeepScript(testdata.get_url(), {"content": "<p>foo</p>"})
+        self.assertNotEqual(key, a2.get_cache_key())
+
+        # the resolved backend is part of the key, not the features property
+        a.features = Soup.get_features()
+        self.assertEqual(key, a.get_cache_key())
+        a.features = "lxml" if a.features != "lxml" else "html.parser"
+        self.assertNotEqual(key, a.get_cache_key())
+        a.features = None
+
+        a.body = {"content": "<p>bar</p>"}
+        self.assertNotEqual(key, a.get_cache_key())
+
 
 class HTMLTest(TestCase):
     def test_lifecycle(self):
@@ -514,13 +1366,88 @@ class HTMLTest(TestCase):
         s = HTML(html)
         self.assertNotEqual(s, s_keep)
 
+    def test_from_element(self):
+        html = self.get_html("tables7")
+        soup = Soup(html)
+        for el in soup.find_all(["td", "th", "caption"]):
+            for keep_images in [True, False]:
+                s = HTML(Soup.inner_html(el), keep_images=keep_images)
+                s2 = HTML.from_element(el, keep_images=keep_images)
+                self.assertEqual(s, s2)
+                self.assertEqual(s.html, s2.html)
+
+        soup = Soup('<td>foo <!-- bar --><IMG src="che.jpeg" /><p>&lt;b&gt;</p> baz</td>')
+        s = HTML.from_element(soup.find("td"), keep_images=True)
+        self.assertEqual("foo \nche.jpeg\n<b>\n baz", s)
+
+    def test_pickle(self):
+        s = HTML("use &lt;b&gt; tags")
+        s2 = pickle.loads(pickle.dumps(s))
+        self.assertEqual("use <b> tags", s2)
+        self.assertEqual(s.html, s2.html)
+
+    def test_lazy(self):
+        a = LazyHTML("<b>foo</b>")
+        b = LazyHTML("bar")
+        self.assertEqual("foox", a + "x")
+        self.assertEqual("xfoo", "x" + a)
+        self.assertEqual("foobar", a + b)
+        self.assertEqual("f", a[0])
+        self.assertEqual("oo", a[1:])
+        self.assertEqual([b, a], sorted([a, b]))
+        self.assertTrue(b < a and a > b and a >= a and a <= a)
+        self.assertEqual("foo,bar", ",".join(String(v) for v in [a, b]))
+
+        c = LazyHTML("&lt;b&gt;")
+        self.assertEqual("<b>", c.unescaped_html)
+        self.assertTrue(c.unescaped_html is c.unescaped_html)
+        # every access is a new tree that can be changed
+        self.assertFalse(a.soup is a.soup)
+
     def test_whitespace(self):
         html = 'Sideways <a href="/wiki/Latin_1" class="mw-redirect" title="Latin 1">Latin</a>-only emoticons'
         s = HTML(html)
         self.assertEqual("Sideways Latin-only emoticons", s)
 
 
+class AttributesTest(TestCase):
+    def test_clean(self):
+        soup = Soup('<a href="/foo" class="bar" title="che" style="baz">a</a><p id="p">p</p>')
+        global_count = len(ATTRIBUTES["Global attribute"])
+        a_count = len(ATTRIBUTES["a"])
+
+        for tag in soup.find_all(True):
+            Attributes(tag).clean()
+
+        self.assertEqual('<a href="/foo" title="che">a</a><p>p</p>', str(soup))
+        self.assertEqual(global_count, len(ATTRIBUTES["Global attribute"]))
+        self.assertEqual(a_count, len(ATTRIBUTES["a"]))
+
+
 class SoupTest(TestCase):
+    def test_features(self):
+        features = Soup.default_features
+        try:
+            self.assertEqual("html.parser", Soup.find_features()[-1])
+
+            Soup.set_features("html.parser")
+            self.assertEqual("html.parser", Soup.get_features())
+
+            Soup.set_features(None)
+            self.assertEqual(Soup.find_features()[0], Soup.get_features())
+
+            Soup.set_features(None)
+            with testdata.environment(PLAIN_SOUP_FEATURES="html.parser"):
+                self.assertEqual("html.parser", Soup.get_features())
+
+        finally:
+            Soup.set_features(features)
+
+        class HTMLParserTable(Table):
+            features = "html.parser"
+        t = HTMLParserTable(testdata.get_url(), "<table></table>")
+        self.assertTrue("HTMLParser" in type(t.soup.builder).__name__)
+
     def test_wrapper(self):
         s = '<p>foo &gt; bar <a href="http://che.com">che</a> baz</p>'
         soup = Soup(s)
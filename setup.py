@@ -28,7 +28,12 @@ setup(
     url='http://github.com/jaymon/{}'.format(name),
     packages=find_packages(),
     license='GPLv2+',
-    install_requires=["captain", "beautifulsoup4", "requests"],
+    install_requires=["captain", "beautifulsoup4", "requests", "futures; python_version < '3'"],
+    extras_require={
+        "async": ["aiohttp"],
+        "numpy": ["numpy"],
+        "json": ["orjson"],
+    },
     tests_require=['testdata'],
     classifiers=[ # https://pypi.python.org/pypi?:action=list_classifiers
         'Development Status :: 4 - Beta',